@@ -3,7 +3,10 @@ from simple_rl.mdp.MDPClass import MDP
 from simple_rl.mdp.StateClass import State
 from simple_rl.agents.AgentClass import Agent
 
-import copy 
+import types
+from collections import deque
+
+import numpy as np
 
 
 '''
@@ -14,65 +17,142 @@ Things to think about:
 - how to keep track or errors/ deviations from the recipes (maybe have a substitution count?)
 '''
 
+# Integer codes used by SaladState.features().
+STATUS_CODES = {"unwashed": 0, "raw": 1, "measured": 2, "cut": 3, "washed": 4, "missing": 5}
+STAGE_CODES = {"initial": 0, "measuring": 1, "clarify": 2, "preparation": 3,
+               "mixing": 4, "dressing": 5, "serving": 6, "done": 7}
+
 class SaladMakingMDP(MDP):
 
     actions = ["check_ingredients", "measure", "clarify", "substitute", 
                  "cut", "clean", "mix", "add_dressing", "serve"]
 
-    init_state = SaladState(
-            ingredients={"lettuce": "unwashed", "avocado": "unwashed", "cucumber": "unwashed"}, # dressing should technically be part of ingredients too
-            stage="initial",
-            tools=["knife", "bowl", "serving spoon"]
-    )
+    def __init__(self):
+        init_state = SaladState(
+                ingredients={"lettuce": "unwashed", "avocado": "unwashed", "cucumber": "unwashed"}, # dressing should technically be part of ingredients too
+                stage="initial",
+                tools=["knife", "bowl", "serving spoon"]
+        )
 
-    def transition_func(state, action):
+        def transition_func(state, action):
             return self._transition_logic(state, action)
 
         def reward_func(state, action, next_state):
             return self._reward_logic(state, action, next_state)
 
-        super().__init__(actions, transition_func, reward_func, init_state)
+        super().__init__(SaladMakingMDP.actions, transition_func, reward_func, init_state)
+        self._build_tables()
+
+    def _build_tables(self):
+        """
+        Summary:
+            Enumerates every state reachable from the initial state and stores the
+            (deterministic) dynamics as dense tables indexed by integer state/action ids:
+                T[s, a] --> s' (np.int32)
+                R[s, a] --> r  (np.float32)
+        """
+        self._action_index = {a: i for i, a in enumerate(self.actions)}
+        self._states = [self.init_state]
+        self._state_index = {self._state_key(self.init_state): 0}
+
+        rows = []
+        frontier = deque([self.init_state])
+        while frontier:
+            state = frontier.popleft()
+            row = []
+            for action in self.actions:
+                next_state = self._compute_transition(state, action)
+                key = self._state_key(next_state)
+                if key not in self._state_index:
+                    self._state_index[key] = len(self._states)
+                    self._states.append(next_state)
+                    frontier.append(next_state)
+                row.append(self._state_index[key])
+            rows.append(row)
+
+        self.T = np.array(rows, dtype=np.int32)
+        self.R = np.zeros(self.T.shape, dtype=np.float32)
+        for sid, state in enumerate(self._states):
+            for aid, action in enumerate(self.actions):
+                self.R[sid, aid] = self._reward_logic(state, action, self._states[self.T[sid, aid]]) or 0
+        self._terminal = np.array([s.is_terminal() for s in self._states], dtype=bool)
+
+    def _state_key(self, state):
+        return (state.signature(), state.is_terminal())
+
+    def get_state_id(self, state):
+        """
+        Returns:
+            (int): Row of @state in self.T/self.R, or None if it isn't reachable from the initial state.
+        """
+        return self._state_index.get(self._state_key(state))
+
+    def get_states(self):
+        return list(self._states)
+
+    def run_tabular_vi(self, delta=0.0001, max_iterations=500):
+        """
+        Args:
+            delta (float): Stop once no value changes by more than @delta.
+            max_iterations (int)
+
+        Returns:
+            (np.ndarray): V[s] for each state id.
+        """
+        V = np.zeros(len(self._states), dtype=np.float32)
+        for _ in range(max_iterations):
+            new_V = (self.R + self.gamma * V[self.T]).max(axis=1)
+            new_V[self._terminal] = 0.0
+            converged = np.abs(new_V - V).max() <= delta
+            V = new_V
+            if converged:
+                break
+        return V
 
     def _transition_logic(self, state, action):
         """
         Handles state transitions based on the current state and action.
         """
-        next_state = copy.deepcopy(state)  
-        ingredients = next_state.data["ingredients"]
-        stage = next_state.data["stage"]
+        sid = self.get_state_id(state)
+        if sid is None:
+            return self._compute_transition(state, action)
+        return self._states[self.T[sid, self._action_index[action]]]
+
+    def _compute_transition(self, state, action):
+        # Only the ingredient statuses and the stage change. Ingredients are stored
+        # read-only, so unchanged ones are shared (tools are never written).
+        ingredients = state.data["ingredients"]
+        stage = state.data["stage"]
+        is_terminal = state.is_terminal()
 
         if action == "check_ingredients":
             if "missing" in ingredients.values():
-                next_state.data["stage"] = "clarify"
+                stage = "clarify"
             else:
-                next_state.data["stage"] = "measuring"
+                stage = "measuring"
         
         elif action == "measure":
-            for ingredient, status in ingredients.items():
-                if status == "raw":
-                    ingredients[ingredient] = "measured"
-            next_state.data["stage"] = "preparation"
+            ingredients = {k: ("measured" if v == "raw" else v) for k, v in ingredients.items()}
+            stage = "preparation"
         
         elif action == "cut":
-            for ingredient, status in ingredients.items():
-                if status == "measured":
-                    ingredients[ingredient] = "cut"
-            next_state.data["stage"] = "mixing"
+            ingredients = {k: ("cut" if v == "measured" else v) for k, v in ingredients.items()}
+            stage = "mixing"
         
         elif action == "mix":
-            next_state.data["stage"] = "dressing"
+            stage = "dressing"
         
         elif action == "add_dressing":
-            next_state.data["stage"] = "serving"
+            stage = "serving"
         
         elif action == "serve":
-            next_state.data["stage"] = "done"
-            next_state.set_terminal(True)
+            stage = "done"
+            is_terminal = True
 
-        return next_state
+        return SaladState(ingredients, stage, state.data["tools"], is_terminal=is_terminal)
 
-     def _reward_logic(self, state, action, next_state):
-       pass 
+    def _reward_logic(self, state, action, next_state):
+        pass 
 
 class SaladState(State):
     def __init__(self, ingredients, stage, tools, is_terminal=False):
@@ -83,17 +163,60 @@ class SaladState(State):
             tools (list): List of available tools.
             is_terminal (bool): Whether this is a terminal state.
         """
+        if not isinstance(ingredients, types.MappingProxyType):
+            ingredients = types.MappingProxyType(dict(ingredients))
         super().__init__(data={"ingredients": ingredients, "stage": stage, "tools": tools}, is_terminal=is_terminal)
 
+        # States are never mutated after construction, so the features are filled in once.
+        self._feat = np.empty(len(ingredients) + 1, dtype=np.int8)
+        for i, status in enumerate(ingredients.values()):
+            self._feat[i] = STATUS_CODES[status]
+        self._feat[-1] = STAGE_CODES[stage]
+        self._feat_onehot = None
+
+    def signature(self):
+        """
+        Returns:
+            (tuple): Hashable summary of the ingredient statuses and stage.
+        """
+        return (tuple(sorted(self.data["ingredients"].items())), self.data["stage"])
+
     def features(self):
         """
         Summary:
             Converts the state into a numerical feature vector for use in RL.
+
+        Returns:
+            (np.ndarray): int8 status code per ingredient, followed by the stage code.
         """
-        return np.array(list(self.data["ingredients"].values()) + [self.data["stage"]])
+        return self._feat
+
+    def features_onehot(self):
+        """
+        Returns:
+            (np.ndarray): float32 array of shape (num_ingredients + 1, num_codes), one row per
+                entry of features() with a 1 in the column of its code.
+        """
+        if self._feat_onehot is None:
+            width = max(len(STATUS_CODES), len(STAGE_CODES))
+            self._feat_onehot = np.zeros((len(self._feat), width), dtype=np.float32)
+            self._feat_onehot[np.arange(len(self._feat)), self._feat] = 1.0
+        return self._feat_onehot
+
+    def __hash__(self):
+        return hash(self.signature())
+
+    def __eq__(self, other):
+        if isinstance(other, SaladState):
+            return self.signature() == other.signature()
+        return False
+
+    def __deepcopy__(self, memo):
+        # Ingredients are read-only, so only the tools list needs copying.
+        return SaladState(self.data["ingredients"], self.data["stage"], list(self.data["tools"]), self.is_terminal())
 
     def __str__(self):
-        return f"Stage: {self.data['stage']}, Ingredients: {self.data['ingredients']}, Tools: {self.data['tools']}"
+        return f"Stage: {self.data['stage']}, Ingredients: {dict(self.data['ingredients'])}, Tools: {self.data['tools']}"
 
 class SaladAgent(Agent):
     def __init__(self, name, actions):
@@ -117,4 +240,4 @@ class SaladAgent(Agent):
             return "add_dressing"
         elif stage == "serving":
             return "serve"
-        return "clarify" 
\ No newline at end of file
+        return "clarify"
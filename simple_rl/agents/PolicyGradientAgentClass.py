@@ -1,20 +1,87 @@
 ''' PolicyGradientAgentClass.py: Class for a policy gradient agent.
 
-Note: At present, this agent is not implemented.'''
+Uses a linear softmax policy over state.features(), updated with the
+Monte Carlo (REINFORCE-style) policy gradient at the end of each episode.'''
 
 # Python imports.
-import random
+from collections import defaultdict
 
 # Other imports
+import numpy as np
 from simple_rl.agents.AgentClass import Agent
+from simple_rl.utils.additional_datastructures import RolloutBuffer
+
+def sample_action(weights, features, rng):
+    '''
+    Args:
+        weights (np.ndarray): (num_features, num_actions) policy weights.
+        features (np.ndarray): Feature vector of the current state.
+        rng (np.random.Generator)
+
+    Returns:
+        (tuple): (action index (int), rng).
+
+    Summary:
+        Computes the logits and samples from the softmax in one function, with the
+        random generator passed in and handed back instead of using the global RNG.
+    '''
+    logits = np.dot(features, weights)
+    logits = logits - logits.max()
+    cdf = np.cumsum(np.exp(logits))
+    action_index = int(np.searchsorted(cdf, rng.random() * cdf[-1], side="right"))
+    return min(action_index, len(cdf) - 1), rng
 
 class PolicyGradientAgent(Agent):
-    ''' Class for a random decision maker. '''
+    ''' Class for a linear softmax policy gradient agent. '''
+
+    def __init__(self, actions, num_features, name="policy-gradient", alpha=0.01, gamma=0.99, buffer_size=10000, seed=None):
+        '''
+        Args:
+            actions (list): Contains strings denoting the actions.
+            num_features (int): Length of state.features().
+            name (str): Denotes the name of the agent.
+            alpha (float): Learning rate.
+            gamma (float): Discount factor.
+            buffer_size (int): Max number of transitions stored between policy updates.
+            seed (int): Seed for the agent's random generator.
+        '''
+        Agent.__init__(self, name=name, actions=actions, gamma=gamma)
+        self.num_features = num_features
+        self.alpha = alpha
+        self.weights = np.zeros((num_features, len(self.actions)))
+        self.buffer = RolloutBuffer(buffer_size, num_features)
+        self._action_index = {a: i for i, a in enumerate(self.actions)}
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+    def get_parameters(self):
+        '''
+        Returns:
+            (dict) key=param_name (str) --> val=param_val (object).
+        '''
+        param_dict = defaultdict(int)
+
+        param_dict["num_features"] = self.num_features
+        param_dict["alpha"] = self.alpha
+        param_dict["gamma"] = self.gamma
+        param_dict["buffer_size"] = self.buffer.capacity
+
+        return param_dict
+
+    def get_action_probs(self, features):
+        '''
+        Args:
+            features (np.ndarray): Either one feature vector or a (batch, num_features) array.
 
-    def __init__(self, actions, name=""):
-        raise NotImplementedError("Policy Gradient has not yet been implemented.")
+        Returns:
+            (np.ndarray): Softmax action distribution(s).
+        '''
+        logits = np.dot(features, self.weights)
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        exp_logits = np.exp(logits)
+        return exp_logits / exp_logits.sum(axis=-1, keepdims=True)
 
-    def act(self, state, reward):
+    def act(self, state, reward, learning=True):
         '''
         Args:
             state (State)
@@ -23,7 +90,16 @@ class PolicyGradientAgent(Agent):
         Returns:
             (str)
         '''
-        pass
+        if learning:
+            self.update(self.prev_state, self.prev_action, reward, state)
+
+        action_index, self.rng = sample_action(self.weights, state.features(), self.rng)
+        action = self.actions[action_index]
+
+        self.prev_state = state
+        self.prev_action = action
+
+        return action
 
     def update(self, state, action, reward, next_state):
         '''
@@ -34,6 +110,40 @@ class PolicyGradientAgent(Agent):
             next_state (State)
 
         Summary:
-            Perform a state of policy gradient.
+            Records the transition, and takes a policy gradient step once the
+            episode ends (or the buffer fills up).
         '''
-        pass
+        if state is None:
+            return
+
+        self.buffer.add(state.features(), self._action_index[action], reward, next_state.is_terminal())
+        if next_state.is_terminal() or self.buffer.is_full():
+            self._policy_gradient_step()
+
+    def _policy_gradient_step(self):
+        '''
+        Summary:
+            One vectorized REINFORCE update over every transition in the buffer:
+                w += alpha * sum_t phi(s_t) (onehot(a_t) - pi(.|s_t)) G_t
+        '''
+        if len(self.buffer) == 0:
+            return
+
+        obs, actions, _, _ = self.buffer.get()
+        returns = self.buffer.compute_returns(self.gamma)
+
+        grad_logits = -self.get_action_probs(obs)
+        grad_logits[np.arange(len(actions)), actions] += 1.0
+        self.weights += self.alpha * np.dot(obs.T, grad_logits * returns[:, None])
+        self.buffer.clear()
+
+    def reset(self):
+        self.weights = np.zeros((self.num_features, len(self.actions)))
+        self.buffer.clear()
+        self.rng = np.random.default_rng(self.seed)
+        Agent.reset(self)
+
+    def end_of_episode(self):
+        # Use whatever was collected if the episode was cut off before a terminal state.
+        self._policy_gradient_step()
+        Agent.end_of_episode(self)
@@ -23,6 +23,7 @@ class GridWorldMDP(MDP):
 
     # Static constants.
     ACTIONS = ["up", "down", "left", "right"]
+    ACTION_INDEX = {action: i for i, action in enumerate(ACTIONS)}
 
     def __init__(self,
                 width=5,
@@ -75,6 +76,7 @@ class GridWorldMDP(MDP):
         self.slip_prob = slip_prob
         self.name = name
         self.lava_locs = lava_locs
+        self._next_loc = None
 
     def get_parameters(self):
         '''
@@ -196,28 +198,65 @@ class GridWorldMDP(MDP):
             elif action == "right":
                 action = random.choice(["up", "down"])
 
-        if action == "up" and state.y < self.height and not self.is_wall(state.x, state.y + 1):
-            next_state = GridWorldState(state.x, state.y + 1)
-        elif action == "down" and state.y > 1 and not self.is_wall(state.x, state.y - 1):
-            next_state = GridWorldState(state.x, state.y - 1)
-        elif action == "right" and state.x < self.width and not self.is_wall(state.x + 1, state.y):
-            next_state = GridWorldState(state.x + 1, state.y)
-        elif action == "left" and state.x > 1 and not self.is_wall(state.x - 1, state.y):
-            next_state = GridWorldState(state.x - 1, state.y)
+        x, y, a = state.x, state.y, GridWorldMDP.ACTION_INDEX.get(action)
+        if type(x) is int and type(y) is int and a is not None and 0 <= x <= self.width + 1 and 0 <= y <= self.height + 1:
+            next_state = GridWorldState(*self._get_next_loc_table()[x][y][a])
         else:
-            next_state = GridWorldState(state.x, state.y)
+            next_state = GridWorldState(*self._move(x, y, action))
 
-
-        landed_in_term_goal = (next_state.x, next_state.y) in self.goal_locs and self.is_goal_terminal
-        landed_in_term_lava = (next_state.x, next_state.y) in self.lava_locs and self.is_lava_terminal
-        if landed_in_term_goal or landed_in_term_lava:
-            next_state.set_terminal(True)
-
-        if (next_state.x, next_state.y) in self.lava_locs:
+        if self._is_terminal_loc(next_state.x, next_state.y):
             next_state.set_terminal(True)
 
         return next_state
 
+    def _move(self, x, y, action):
+        '''
+        Args:
+            x (int)
+            y (int)
+            action (str)
+
+        Returns:
+            (tuple): The (x, y) that @action leads to from (x, y), ignoring slip.
+        '''
+        if action == "up" and y < self.height and not self.is_wall(x, y + 1):
+            return x, y + 1
+        elif action == "down" and y > 1 and not self.is_wall(x, y - 1):
+            return x, y - 1
+        elif action == "right" and x < self.width and not self.is_wall(x + 1, y):
+            return x + 1, y
+        elif action == "left" and x > 1 and not self.is_wall(x - 1, y):
+            return x - 1, y
+        return x, y
+
+    def get_next_loc_table(self):
+        '''
+        Returns:
+            (np.ndarray): int32 array of shape (width + 2, height + 2, len(ACTIONS), 2), where
+                [x, y, a] is the (x, y) that ACTIONS[a] leads to from (x, y), ignoring slip.
+
+        Summary:
+            Built once, on first use, from the walls and grid size at that point. Only the
+            geometry is cached; goal and lava locations are checked on every transition.
+        '''
+        return np.array(self._get_next_loc_table(), dtype=np.int32)
+
+    def _get_next_loc_table(self):
+        # Nested lists of tuples, which are faster than numpy indexing for one lookup at a time.
+        if self._next_loc is None:
+            self._next_loc = [[[self._move(x, y, action) for action in GridWorldMDP.ACTIONS]
+                               for y in range(self.height + 2)]
+                              for x in range(self.width + 2)]
+        return self._next_loc
+
+    def _is_terminal_loc(self, x, y):
+        '''
+        Returns:
+            (bool): True iff landing on (x, y) ends the episode (lava always does).
+        '''
+        landed_in_term_goal = (x, y) in self.goal_locs and self.is_goal_terminal
+        return landed_in_term_goal or (x, y) in self.lava_locs
+
     def is_wall(self, x, y):
         '''
         Args:
@@ -1,6 +1,11 @@
 ''' additional_datastructures.py: File containing custom utility data structures for use in simple_rl. '''
+
+# Python imports.
 import json
 
+# Other imports.
+import numpy as np
+
 class SimpleRLStack(object):
     ''' Implementation for a basic Stack data structure '''
     def __init__(self, _list=None):
@@ -36,6 +41,80 @@ class SimpleRLStack(object):
         return len(self._list)
 
 
+class RolloutBuffer(object):
+    ''' Fixed-capacity circular buffer of (observation, action, reward, done) transitions, stored as numpy arrays. '''
+    def __init__(self, capacity, obs_dim, obs_dtype=np.float32):
+        '''
+        Args:
+            capacity (int): Max number of transitions held; the oldest is overwritten once full.
+            obs_dim (int): Length of each observation (feature) vector.
+            obs_dtype (np.dtype): Storage type for observations (ex: np.int8 for small discrete features).
+        '''
+        self.capacity = capacity
+        self.obs = np.zeros((capacity, obs_dim), dtype=obs_dtype)
+        self.actions = np.zeros(capacity, dtype=np.int32)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=np.bool_)
+        self.ptr = 0
+        self.size = 0
+
+    def add(self, obs, action, reward, done):
+        '''
+        Args:
+            obs (iterable)
+            action (int): Index of the action taken.
+            reward (float)
+            done (bool): True if the episode ended after this transition.
+        '''
+        self.obs[self.ptr] = obs
+        self.actions[self.ptr] = action
+        self.rewards[self.ptr] = reward
+        self.dones[self.ptr] = done
+        self.ptr = (self.ptr + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def get(self):
+        '''
+        Returns:
+            (tuple): obs, actions, rewards, dones, oldest transition first.
+        '''
+        if self.size < self.capacity:
+            return self.obs[:self.size], self.actions[:self.size], self.rewards[:self.size], self.dones[:self.size]
+        order = np.roll(np.arange(self.capacity), -self.ptr)
+        return self.obs[order], self.actions[order], self.rewards[order], self.dones[order]
+
+    def compute_returns(self, gamma):
+        '''
+        Args:
+            gamma (float)
+
+        Returns:
+            (np.ndarray): Discounted return from each stored transition to the end of its episode,
+                in the same order as get().
+
+        Summary:
+            Backward recurrence G_t = r_t + gamma * G_{t+1} * (1 - done_t), so the return
+            restarts at every episode boundary.
+        '''
+        _, _, rewards, dones = self.get()
+        returns = np.zeros(len(rewards), dtype=np.float64)
+        G = 0.0
+        for t in range(len(rewards) - 1, -1, -1):
+            G = rewards[t] + gamma * G * (not dones[t])
+            returns[t] = G
+        return returns.astype(np.float32)
+
+    def is_full(self):
+        return self.size == self.capacity
+
+    def clear(self):
+        self.ptr = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+
 class TupleEncoder(json.JSONEncoder):
     '''
         A simple class for adding tuple encoding to json, from:
@@ -2,104 +2,280 @@
 import gym
 from gym import Env, spaces
 import numpy as np
+from dataclasses import dataclass
+from typing import NamedTuple
+
+from jit_utils import check_actions, njit
+
+# Every action the env understands; step() works on indices into this tuple.
+ACTIONS = ("Measure", "Wash", "Chop", "Dice", "Shred", "Crush", "Grind", "Roast", "Combine", "Mix", "Serve")
+ACTION_CODES = {name: i for i, name in enumerate(ACTIONS)}
+MEASURE = ACTION_CODES["Measure"]
+MIX = ACTION_CODES["Mix"]
+SERVE = ACTION_CODES["Serve"]
+
+# One bit per known allergen; sets of allergens are stored as OR-ed masks.
+ALLERGENS = ("nut", "gluten", "dairy", "egg", "soy", "shellfish")
+ALLERGEN_BIT = {name: 1 << i for i, name in enumerate(ALLERGENS)}
+
+def allergen_mask(allergens, strict=False):
+    '''
+    Args:
+        allergens (list): Allergen names.
+        strict (bool): If True, raise ValueError on a name outside ALLERGENS; otherwise such
+            names are ignored, since no ingredient can contain them.
+
+    Returns:
+        (int): Bitmask with the bit of each known allergen set.
+    '''
+    mask = 0
+    for name in allergens:
+        if name not in ALLERGEN_BIT:
+            if strict:
+                raise ValueError(f"Unknown allergen: '{name}'")
+            continue
+        mask |= ALLERGEN_BIT[name]
+    return mask
+
+def allergen_names(mask):
+    return [name for name in ALLERGENS if mask & ALLERGEN_BIT[name]]
 
 
 class Ingredient:
+    # Static recipe data only: the per-episode prep state lives in SaladMakingEnv's arrays.
+    __slots__ = ("name", "available_quantity", "dietary_restrictions", "allergen_mask",
+                 "possible_actions", "action_names", "action_plan", "requested_quantity",
+                 "prep_flow", "prep_flow_codes", "calories")
+
     def __init__(self, name, available_quantity, calories, dietary_restrictions=[]):
         self.name = name
         self.available_quantity = available_quantity
-        self.state = "raw"
         self.dietary_restrictions = dietary_restrictions or []
+        self.allergen_mask = allergen_mask(self.dietary_restrictions, strict=True)
         self.possible_actions = {
             "Measure": ["Measure"],
             "Combine": ["Combine"]
         }
-        self.prep_step = 0
         self.requested_quantity = 0
         self.prep_flow = []
+        self.prep_flow_codes = np.zeros(0, dtype=np.int8)
         self.calories = calories
 
-    def update_state(self, action):
-        # Check if the action is valid for the current step
-        #current_action_key = list(self.possible_actions.keys())[self.prep_step]
-        #if action in self.possible_actions[current_action_key]:
-        if self.prep_step < len(self.prep_flow) and action == self.prep_flow[self.prep_step]:
-            if action == "Measure":
-                self.apply_ingredient_effects()
-            self.state = action.lower()
-            self.prep_step += 1
-            return "success"
-        else:
-            #raise ValueError(f"Invalid action: {action} not allowed at this step.")
-            return "invalid"
-        
-    def apply_ingredient_effects(self):
-        if self.requested_quantity <= self.available_quantity:
-            self.available_quantity -= self.requested_quantity
-        else:
-            raise ValueError(f"Not enough {self.name} available")
-
-    def is_ready(self):
-        # Returns True if all steps are completed
-        return self.prep_step >= len(self.prep_flow)
+    def _finalize(self):
+        '''
+        Summary:
+            Freezes possible_actions (in insertion order) into the parallel tuples
+            action_names and action_plan, then drops the dict. Subclasses call this
+            at the end of __init__, once they have added their own actions.
+        '''
+        self.action_names = tuple(self.possible_actions)
+        self.action_plan = tuple(tuple(actions) for actions in self.possible_actions.values())
+        del self.possible_actions
+
+    def allowed_actions(self, action_name):
+        '''
+        Args:
+            action_name (str): e.g. "Prepare".
+
+        Returns:
+            (tuple): The actions allowed for @action_name, or () if the ingredient has none.
+        '''
+        if action_name in self.action_names:
+            return self.action_plan[self.action_names.index(action_name)]
+        return ()
 
 class Vegetable(Ingredient):
+    __slots__ = ()
+    TYPE_CODE = 0
+
     def __init__(self, name, quantity, calories, dietary_restrictions=None):
         super().__init__(name, quantity, calories, dietary_restrictions)
         self.possible_actions.update({
             "Wash": ["Wash"],
             "Prepare": ["Chop", "Dice", "Shred"]
         })
+        self._finalize()
 
 class Dressing(Ingredient):
+    __slots__ = ()
+    TYPE_CODE = 1
+
     def __init__(self, name, quantity, calories, dietary_restrictions=None):
         super().__init__(name, quantity, calories, dietary_restrictions)
+        self._finalize()
 
 class Nuts(Ingredient):
+    __slots__ = ()
+    TYPE_CODE = 2
+
     def __init__(self, name, quantity, calories, dietary_restrictions=None):
         super().__init__(name, quantity, calories, dietary_restrictions)
         self.possible_actions.update({
             "Prepare": ["Crush", "Dice", "Grind"],
             "Roast": ["Roast"]
         })
+        self._finalize()
+
+# Indexed by Ingredient.TYPE_CODE.
+STAGE_NAMES = ("Vegetables", "Dressing", "Nuts")
+
+def _vegetable_prep_flow(prep_method):
+    return ["Measure", "Wash", prep_method, "Combine"] if prep_method else ["Measure", "Wash", "Combine"]
+
+def _dressing_prep_flow(prep_method):
+    return ["Measure", "Combine"]
+
+def _nuts_prep_flow(prep_method):
+    return ["Measure", prep_method, "Roast", "Combine"] if prep_method else ["Measure", "Roast", "Combine"]
+
+PREP_FLOW_BUILDERS = (_vegetable_prep_flow, _dressing_prep_flow, _nuts_prep_flow)
+
+# Indexed by Ingredient.TYPE_CODE.
+INGREDIENT_TYPES = (Vegetable, Dressing, Nuts)
+
+@dataclass(frozen=True, slots=True)
+class IngredientSpec:
+    ''' Immutable description of a stocked ingredient; make() builds a fresh Ingredient from it. '''
+    name: str
+    available_quantity: int
+    calories: int
+    type_code: int
+    dietary_restrictions: tuple = ()
+
+    def make(self):
+        return INGREDIENT_TYPES[self.type_code](self.name, self.available_quantity, self.calories,
+                                                list(self.dietary_restrictions))
 
 AVAILABLE_INGREDIENTS = {
-    "tomato": Vegetable("tomato", 2, 20, []),
-    "carrot": Vegetable("carrot", 3, 25, []), 
-    "lettuce": Vegetable("lettuce", 2, 10, []), 
-    "spinach": Vegetable("spinach", 3, 15, []), 
-    "almonds": Nuts("almonds", 100, 50, ["nut"]), 
-    "sesame_dressing": Dressing("sesame_dressing", 100, 60, []),
+    "tomato": IngredientSpec("tomato", 2, 20, Vegetable.TYPE_CODE),
+    "carrot": IngredientSpec("carrot", 3, 25, Vegetable.TYPE_CODE),
+    "lettuce": IngredientSpec("lettuce", 2, 10, Vegetable.TYPE_CODE),
+    "spinach": IngredientSpec("spinach", 3, 15, Vegetable.TYPE_CODE),
+    "almonds": IngredientSpec("almonds", 100, 50, Nuts.TYPE_CODE, ("nut",)),
+    "sesame_dressing": IngredientSpec("sesame_dressing", 100, 60, Dressing.TYPE_CODE),
 }
 
+@njit(cache=True)
+def _step_kernel(state_arr, action_id, valid_table, prep_flow_len, calorie_table, allergy_table, calorie_limit, max_steps):
+    '''
+    Args:
+        state_arr (np.ndarray): int32 [current_step, calorie_count, prep_step_0, ..., prep_step_n-1], updated in place.
+        action_id (int): Index into ACTIONS (-1 for an unknown action).
+        valid_table (np.ndarray): bool (n, max_flow_len + 1, len(ACTIONS) + 1); True where action a is the
+            next step of ingredient i's prep flow at prep step p. The extra row/column keep finished flows
+            and unknown actions (-1) in bounds.
+        prep_flow_len (np.ndarray): int8 (n,) length of each prep flow.
+        calorie_table (np.ndarray): int32 (n,) calories added once ingredient i is ready.
+        allergy_table (np.ndarray): int32 (n,) number of ingredient i's restrictions that are user allergies.
+        calorie_limit (float)
+        max_steps (int): Episode ends once current_step reaches this.
+
+    Returns:
+        (tuple): reward (int), index of the ingredient whose constraints were checked or -1, done (bool).
+    '''
+    n = prep_flow_len.shape[0]
+    step = state_arr[0]
+    reward = 0
+    checked = -1
+    done = False
+
+    if step < n:
+        ok = np.int32(valid_table[step, state_arr[2 + step], action_id])
+        state_arr[2 + step] += ok
+        reward += 15 * ok - 5
+
+        # An invalid action skips the ingredient; a valid one moves on once its flow is done.
+        if ok == 0 or state_arr[2 + step] >= prep_flow_len[step]:
+            state_arr[1] += ok * calorie_table[step]
+            state_arr[0] = step + 1
+            checked = step
+
+        if checked >= 0:
+            violated = allergy_table[checked]
+            if state_arr[1] > calorie_limit:
+                violated += 1
+            reward -= 2 * violated
+
+    elif step == n:
+        if action_id == MIX:
+            reward += 10
+            state_arr[0] = step + 1
+        else:
+            reward -= 5
+
+    elif step == n + 1:
+        if action_id == SERVE:
+            reward += 10
+            done = True
+        else:
+            reward -= 5
+
+    if state_arr[0] >= max_steps:
+        done = True
+
+    return reward, checked, done
+
+@njit(cache=True)
+def _rollout_kernel(state_arr, actions, valid_table, prep_flow_len, calorie_table, allergy_table, calorie_limit, max_steps):
+    '''
+    Args:
+        state_arr (np.ndarray): As in _step_kernel, updated in place.
+        actions (np.ndarray): int32 action ids to apply in order.
+        (remaining args as in _step_kernel)
+
+    Returns:
+        (tuple): rewards (np.ndarray int32, per step), number of actions applied, done (bool).
+    '''
+    rewards = np.zeros(actions.shape[0], dtype=np.int32)
+    for t in range(actions.shape[0]):
+        reward, checked, done = _step_kernel(state_arr, actions[t], valid_table, prep_flow_len,
+                                             calorie_table, allergy_table, calorie_limit, max_steps)
+        rewards[t] = reward
+        if done:
+            return rewards, t + 1, True
+    return rewards, actions.shape[0], False
+
+class Timestep(NamedTuple):
+    ''' Immutable result of SaladMakingEnv.pure_step. '''
+    t: int
+    state: np.ndarray
+    action: int
+    reward: int
+    done: bool
+
 class SaladMakingEnv(Env):
-    def __init__(self, recipe, constraints):
+    def __init__(self, recipe, constraints, verbose=False):
         super(SaladMakingEnv, self).__init__()
+        self.verbose = verbose
         self.recipe = recipe
         self.constraints = constraints
         self.calorie_count = 0
         self.violations = {"calories": 0, "allergies": [], "availability": {}} # how many calories are we over/ under by, which allergies are violated, which ingredients are unavailable
+        self.violations_mask = 0
         self.current_step = 0  
         self.step_order = ["Vegetables", "Dressing", "Nuts", "Mix", "Serve"]
         self.reward = 0
         self.ingredients = self.initialize_ingredients()
+        self._compile_tables()
         
     
     def initialize_ingredients(self):
         ingredients = {}
+        unavailable = []
         for ingredient_name, details in self.recipe.items():
             if ingredient_name not in AVAILABLE_INGREDIENTS:
-                print(ingredient_name)
+                if self.verbose:
+                    print(ingredient_name)
                 # Ingredient not available
                 self.violations['availability'][ingredient_name] = "Unavailable"
                 self.reward -= 5
+                unavailable.append(ingredient_name)
                 continue
 
             else:
-                # Get the ingredient from the available bank
-                ingredient = AVAILABLE_INGREDIENTS[ingredient_name]
+                # Build a fresh ingredient from the available bank
+                ingredient = AVAILABLE_INGREDIENTS[ingredient_name].make()
                 ingredient.requested_quantity = details.get("quantity", 0)
-                print()
                 
             # Check availability
             if ingredient.requested_quantity > ingredient.available_quantity:
@@ -109,95 +285,273 @@ class SaladMakingEnv(Env):
 
             # Set Preparation flow based on ingredient type
             prep_method = details.get("prep_method")
-            if prep_method:
-                if "Prepare" in ingredient.possible_actions.keys():
-                    if prep_method not in ingredient.possible_actions['Prepare']:
-                        raise ValueError(f"Invalid prep method '{prep_method}' for ingredient: '{ingredient_name}'")
-                
-                if isinstance(ingredient, Vegetable):
-                    ingredient.prep_flow = ['Measure', 'Wash', prep_method, "Combine"]
-
-                if isinstance(ingredient, Nuts):
-                    ingredient.prep_flow = ['Measure', prep_method, 'Roast', 'Combine']
-            else:
-                if isinstance(ingredient, Vegetable):
-                    ingredient.prep_flow = ["Measure", "Wash", "Combine"]
-                elif isinstance(ingredient, Nuts):
-                    ingredient.prep_flow = ["Measure", "Roast", "Combine"]
-                elif isinstance(ingredient, Dressing):
-                    ingredient.prep_flow = ["Measure", "Combine"]
+            prep_methods = ingredient.allowed_actions("Prepare")
+            if prep_method and prep_methods:
+                if prep_method not in prep_methods:
+                    raise ValueError(f"Invalid prep method '{prep_method}' for ingredient: '{ingredient_name}'")
+            ingredient.prep_flow = PREP_FLOW_BUILDERS[ingredient.TYPE_CODE](prep_method)
+            ingredient.prep_flow_codes = np.array([ACTION_CODES[action] for action in ingredient.prep_flow], dtype=np.int8)
 
             ingredients[ingredient_name] = ingredient
 
+        self._ingredient_names = tuple(ingredients)
+        self._unavailable = tuple(unavailable)
         return ingredients
 
-    def step(self, action):
-        done = False
-
-        current_stage_data = self.get_stage()
-        stage = current_stage_data["stage"]
+    def _compile_tables(self):
+        '''
+        Summary:
+            Lays the current ingredients out as parallel arrays indexed by ingredient id
+            (the order of self._ingredient_names). These, not the Ingredient objects, hold
+            the per-episode state that step() updates.
+        '''
+        n = len(self.ingredients)
+        flows = [ingredient.prep_flow for ingredient in self.ingredients.values()]
+        max_flow_len = max([len(flow) for flow in flows] + [1])
+
+        self._valid_table = np.zeros((n, max_flow_len + 1, len(ACTIONS) + 1), dtype=np.bool_)
+        self._prep_flow_len = np.zeros(n, dtype=np.int8)
+        self._req_qty = np.zeros(n, dtype=np.int32)
+        self._avail_qty = np.zeros(n, dtype=np.int32)
+        self._calories_per_unit = np.zeros(n, dtype=np.int32)
+        self._allergy_table = np.zeros(n, dtype=np.int32)
+        self._type_code = np.zeros(n, dtype=np.int8)
+        self._constraint_mask = allergen_mask(self.constraints["allergies"])
+        for i, ingredient in enumerate(self.ingredients.values()):
+            self._valid_table[i, np.arange(len(ingredient.prep_flow_codes)), ingredient.prep_flow_codes] = True
+            self._prep_flow_len[i] = len(ingredient.prep_flow)
+            self._req_qty[i] = ingredient.requested_quantity
+            self._avail_qty[i] = ingredient.available_quantity
+            self._calories_per_unit[i] = ingredient.calories
+            self._allergy_table[i] = (ingredient.allergen_mask & self._constraint_mask).bit_count()
+            self._type_code[i] = ingredient.TYPE_CODE
+        self._calorie_table = self._req_qty * self._calories_per_unit
+        self._calorie_cumsum = np.cumsum(self._calorie_table)
+
+        self._avail_initial = self._avail_qty.copy()
+
+        # Last successful action per ingredient (-1 while still raw).
+        self._ing_state = np.full(n, -1, dtype=np.int8)
+        self._state_arr = np.zeros(2 + n, dtype=np.int32)
+        self.prep_steps = self._state_arr[2:]
+        self._max_steps = n + len(self.step_order)
+
+        self._stage_cache = (-1, None)
+        self._obs = {"current_stage": None, "calorie_count": 0, "violations": self.violations}
+
+        # Ring buffer of (current_step, action_id, total reward) rows, one per step() call;
+        # sized to hold an episode that follows every prep flow.
+        self._log = np.zeros((int(self._prep_flow_len.sum()) + len(self.step_order), 3), dtype=np.int32)
+        self._log_len = 0
+
+    def _reset_episode(self):
+        '''
+        Summary:
+            Restores the per-episode arrays in place. The recipe tables only depend on the
+            recipe and the (frozen) ingredient specs, so they are kept.
+        '''
+        self._avail_qty[:] = self._avail_initial
+        self._ing_state[:] = -1
+        self._state_arr[:] = 0
+        self._stage_cache = (-1, None)
+        self._log_len = 0
+
+    def is_ready(self, i):
+        '''
+        Args:
+            i (int): Ingredient id.
+
+        Returns:
+            (bool): True if every step of the ingredient's prep flow is done.
+        '''
+        return self.prep_steps[i] >= self._prep_flow_len[i]
+
+    def get_action_schedule(self):
+        '''
+        Returns:
+            (list): (ingredient name or None, action) pairs that follow every prep flow,
+                then Mix and Serve; the full recipe script in step order.
+        '''
+        schedule = [(name, action) for name in self._ingredient_names for action in self.ingredients[name].prep_flow]
+        schedule.append((None, "Mix"))
+        schedule.append((None, "Serve"))
+        return schedule
+
+    def rollout_deterministic(self):
+        '''
+        Returns:
+            (tuple): reward (int), violations (dict) of an episode that runs
+                get_action_schedule() from reset, as stepping through it would report them.
+
+        Summary:
+            Computes the result in closed form from the recipe tables; the env itself is not touched.
+            Every scheduled action is valid (+10), Mix and Serve add 10 each, and each finished
+            ingredient costs 2 per violated constraint.
+        '''
+        limit = self.constraints["calories"]
+        over_limit = self._calorie_cumsum > limit
+        num_violations = int(self._allergy_table.sum()) + int(over_limit.sum())
+        reward = 10 * int(self._prep_flow_len.sum()) + 20 - 2 * num_violations
+
+        hit = 0
+        for ingredient in self.ingredients.values():
+            hit |= ingredient.allergen_mask & self._constraint_mask
+        total_calories = int(self._calorie_cumsum[-1]) if len(self._calorie_cumsum) else 0
+        violations = {
+            "calories": total_calories - limit if total_calories > limit else 0,
+            "allergies": allergen_names(hit),
+            "availability": {},
+        }
+        return reward, violations
 
-        if stage in ["Vegetables", "Dressing", "Nuts"]:
-            ingredient_name = current_stage_data.get("ingredient")
-            ingredient = self.ingredients[ingredient_name]
-            result = ingredient.update_state(action)
+    def get_action_codes(self):
+        '''
+        Returns:
+            (np.ndarray): int8 action ids of get_action_schedule(), for step_by_code().
+        '''
+        return np.concatenate([ingredient.prep_flow_codes for ingredient in self.ingredients.values()]
+                              + [np.array([MIX, SERVE], dtype=np.int8)])
 
-            if result == "success":
-                self.reward += 10
-                if ingredient.is_ready():
-                    self.calorie_count += ingredient.requested_quantity * ingredient.calories
-                    self.current_step += 1
+    def get_ingredient_state(self, i):
+        code = self._ing_state[i]
+        return "raw" if code < 0 else ACTIONS[code].lower()
 
-                    violations_by_ing = self.check_constraints(ingredient)
-                    if violations_by_ing > 0:
-                        self.reward -= (2*violations_by_ing)
-            else:
-                self.reward -= 5
-                self.current_step += 1
-
-                violations_by_ing = self.check_constraints(ingredient)
-                if violations_by_ing > 0:
-                    self.reward -= (2*violations_by_ing)
+    def step(self, action):
+        return self.step_by_code(ACTION_CODES.get(action, -1))
+
+    def step_by_code(self, action_id):
+        '''
+        Args:
+            action_id (int): Index into ACTIONS (-1 for an unknown action).
+
+        Returns:
+            (tuple): As step().
+        '''
+        action_id = int(action_id)
+        check_actions(action_id, -1, len(ACTIONS))
+        step = self.current_step
+        in_prep = step < len(self._ingredient_names)
+        prep_step = self.prep_steps[step] if in_prep else 0
+        reward, checked, done = _step_kernel(self._state_arr, action_id,
+                                             self._valid_table, self._prep_flow_len, self._calorie_table,
+                                             self._allergy_table, self.constraints["calories"], self._max_steps)
+        self.reward += reward
+        row = self._log[self._log_len % len(self._log)]
+        row[0], row[1], row[2] = step, action_id, self.reward
+        self._log_len += 1
+        self.current_step = int(self._state_arr[0])
+        self.calorie_count = int(self._state_arr[1])
+
+        if in_prep:
+            if self.prep_steps[step] > prep_step:
+                if action_id == MEASURE:
+                    if self._req_qty[step] > self._avail_qty[step]:
+                        raise ValueError(f"Not enough {self._ingredient_names[step]} available")
+                    self._avail_qty[step] -= self._req_qty[step]
+                self._ing_state[step] = action_id
+            if checked >= 0:
+                self.check_constraints(self.ingredients[self._ingredient_names[step]])
+
+        if done and self.verbose:
+            print(self.format_log())
 
-        elif stage == "Mix":
-            if action == "Mix":
-                self.reward += 10
-                self.current_step += 1
-            else:
-                self.reward -= 5
+        return self.get_observation(), self.reward, done, {"violations": self.violations}
 
-        elif stage == "Serve":
-            if action == "Serve":
-                self.reward += 10
-                done = True
+    def get_log(self):
+        '''
+        Returns:
+            (np.ndarray): int32 (num_rows, 3) rows of (current_step, action_id, total reward) since the
+                last reset, oldest first. Only the most recent len(self._log) steps are kept.
+        '''
+        if self._log_len <= len(self._log):
+            return self._log[:self._log_len].copy()
+        return np.roll(self._log, -(self._log_len % len(self._log)), axis=0)
+
+    def format_log(self):
+        '''
+        Returns:
+            (str): One line per logged step, with the running total reward as step() returns it.
+        '''
+        n = len(self._ingredient_names)
+        lines = []
+        for step, action_id, reward in self.get_log():
+            action = ACTIONS[action_id] if action_id >= 0 else "<unknown>"
+            if step < n:
+                lines.append(f"Processed {self._ingredient_names[step]}: {action}, Reward: {reward}")
+            elif step == n:
+                lines.append(f"Mixing: {action}, Reward: {reward}")
             else:
-                self.reward -= 5
-
-
-        # Determine if the MDP is complete
-        if self.current_step >= len(self.ingredients) + len(self.step_order):
-            done = True
-
-        return self.get_observation(), self.reward, done, {"violations": self.violations}
+                lines.append(f"Serving: {action}, Reward: {reward}")
+        return "\n".join(lines)
+
+    def _kernel_tables(self):
+        return (self._valid_table, self._prep_flow_len, self._calorie_table, self._allergy_table,
+                self.constraints["calories"], self._max_steps)
+
+    def pure_reset(self):
+        '''
+        Returns:
+            (Timestep): Start of an episode; does not touch the env's own state.
+        '''
+        return Timestep(0, np.zeros_like(self._state_arr), -1, 0, False)
+
+    def pure_step(self, timestep, action):
+        '''
+        Args:
+            timestep (Timestep)
+            action (str or int): Action name or index into ACTIONS.
+
+        Returns:
+            (Timestep): The next timestep. @timestep is left unchanged.
+        '''
+        action_id = ACTION_CODES.get(action, -1) if isinstance(action, str) else int(action)
+        check_actions(action_id, -1, len(ACTIONS))
+        state = timestep.state.copy()
+        reward, _, done = _step_kernel(state, action_id, *self._kernel_tables())
+        return Timestep(timestep.t + 1, state, action_id, reward, done)
+
+    def rollout(self, actions, timestep=None):
+        '''
+        Args:
+            actions (list): Action names or indices, applied until the episode ends.
+            timestep (Timestep): Where to start from (defaults to pure_reset()).
+
+        Returns:
+            (tuple): rewards (np.ndarray, per applied action), final Timestep.
+
+        Summary:
+            Runs the whole episode in a single compiled call instead of one step() per action.
+        '''
+        if timestep is None:
+            timestep = self.pure_reset()
+        action_ids = np.array([ACTION_CODES.get(a, -1) if isinstance(a, str) else a for a in actions], dtype=np.int32)
+        check_actions(action_ids, -1, len(ACTIONS))
+        state = timestep.state.copy()
+        rewards, n, done = _rollout_kernel(state, action_ids, *self._kernel_tables())
+        if n == 0:
+            return rewards, timestep._replace(state=state)
+        return rewards[:n], Timestep(timestep.t + n, state, int(action_ids[n - 1]), int(rewards[n - 1]), done)
 
     def get_stage(self):
+        '''
+        Returns:
+            (dict): The current stage. The same dict is returned until current_step changes,
+                with only its "current_state" entry refreshed in between.
+        '''
+        if self._stage_cache[0] != self.current_step:
+            self._stage_cache = (self.current_step, self._build_stage())
+        stage = self._stage_cache[1]
+        if "current_state" in stage:
+            stage["current_state"] = self.get_ingredient_state(self.current_step)
+        return stage
+
+    def _build_stage(self):
         if self.current_step < len(self.ingredients):
-            ingredient_names = list(self.ingredients.keys())
-            ingredient_name = ingredient_names[self.current_step]
-            ingredient = self.ingredients[ingredient_name]
-
-            # Determine stage based on ingredient type
-            if isinstance(ingredient, Vegetable):
-                stage = "Vegetables"
-            elif isinstance(ingredient, Dressing):
-                stage = "Dressing"
-            elif isinstance(ingredient, Nuts):
-                stage = "Nuts"
-
+            ingredient_name = self._ingredient_names[self.current_step]
             return {
-                "stage": stage,
+                "stage": STAGE_NAMES[self._type_code[self.current_step]],
                 "ingredient": ingredient_name,
-                "current_state": ingredient.state,
+                "current_state": self.get_ingredient_state(self.current_step),
             }
 
         elif self.current_step == len(self.ingredients):
@@ -209,76 +563,145 @@ class SaladMakingEnv(Env):
 
 
     def reset(self):
-        # Reset state
-        self.ingredients = self.initialize_ingredients()
+        # Reset state; unavailable ingredients are reported and penalised again, as on construction.
+        for ingredient_name in self._unavailable:
+            if self.verbose:
+                print(ingredient_name)
+            self.reward -= 5
+        self._reset_episode()
         self.calorie_count = 0
         self.violations = {"calories": 0, "allergies": [], "availability": {}}
+        self.violations_mask = 0
         self.current_step = 0
         return self.get_observation()
     
     def get_observation(self):
-        return {
-            "current_stage": self.get_stage(),
-            "calorie_count": self.calorie_count,
-            "violations": self.violations,
-        }
+        # Updated in place: each call returns the same dict.
+        obs = self._obs
+        obs["current_stage"] = self.get_stage()
+        obs["calorie_count"] = self.calorie_count
+        obs["violations"] = self.violations
+        return obs
 
     def check_constraints(self, ingredient):
+        '''
+        Args:
+            ingredient (Ingredient): The ingredient that was just finished (or skipped).
+
+        Returns:
+            (int): Number of constraints it violated. Only this ingredient is checked.
+        '''
         constraints_violated = 0
         if self.calorie_count > self.constraints["calories"]:
             self.violations["calories"] = self.calorie_count - self.constraints["calories"]
             constraints_violated +=1
 
-        for restriction in ingredient.dietary_restrictions:
-            if restriction in self.constraints["allergies"]:
-                print(restriction)
-                self.violations["allergies"].append(restriction) 
-                constraints_violated += 1
+        hit = ingredient.allergen_mask & self._constraint_mask
+        if hit:
+            if self.verbose:
+                for restriction in allergen_names(hit):
+                    print(restriction)
+            # The readable list is only rebuilt when a new allergen shows up.
+            if hit & ~self.violations_mask:
+                self.violations_mask |= hit
+                self.violations["allergies"] = allergen_names(self.violations_mask)
+            constraints_violated += hit.bit_count()
         return constraints_violated
     
-    
-
-recipe = {
-    "tomato": {"type": "Vegetable", "quantity": 2, "prep_method": "Dice"},
-    "carrot": {"type": "Vegetable", "quantity": 3, "prep_method": "Shred"}, 
-    "lettuce": {"type": "Vegetable", "quantity": 1, "prep_method": "Chop"},
-    "spinach": {"type": "Vegetable", "quantity": 1},  # just add whole
-    "sesame_dressing": {"type": "Dressing", "quantity": 10},
-    "almonds": {"type": "Nuts", "quantity": 10, "prep_method": "Grind"},
-    "walnuts": {"type": "Nuts", "quantity": 15}  # just roast and add whole
-}
-
-constraints = {
-    "calories": 300,
-    "allergies": ["nut"]
-}
-
-env = SaladMakingEnv(recipe, constraints)
-obs = env.reset()
-
-done = False
-while not done:
-    current_stage = obs["current_stage"]
-    stage = current_stage["stage"]
-
-    if stage in ["Vegetables", "Dressing", "Nuts"]:
-        ingredient_name = current_stage.get("ingredient")
-        ingredient = env.ingredients[ingredient_name]
 
-        # Loop through preparation actions for the current ingredient
-        while not ingredient.is_ready():
-            #current_action_key = list(ingredient.possible_actions.keys())[ingredient.prep_step]
-            #action = ingredient.possible_actions[current_action_key][0]
-            action = ingredient.prep_flow[ingredient.prep_step]
-            obs, reward, done, info = env.step(action)
-            print(f"\nProcessed {ingredient_name}: {action}, Reward: {reward}, {info}")
+class VectorSaladEnv(object):
+    ''' Steps @num_envs copies of one SaladMakingEnv recipe in lockstep with NumPy. '''
+
+    def __init__(self, env, num_envs):
+        '''
+        Args:
+            env (SaladMakingEnv): Supplies the recipe tables (from its most recent reset).
+            num_envs (int)
+        '''
+        self.num_envs = num_envs
+        (self._valid_table, self._prep_flow_len, self._calorie_table, self._allergy_table,
+         self._calorie_limit, self._max_steps) = env._kernel_tables()
+        self._n = len(self._prep_flow_len)
+        self._rows = np.arange(num_envs)
+        self.reset()
 
-    elif stage == "Mix":
-        obs, reward, done, info = env.step("Mix")
-        print(f"\nMixing: Reward: {reward}")
-
-    elif stage == "Serve":
-        obs, reward, done, info = env.step("Serve")
-        print(f"\nServing: Reward: {reward}")
-
-    #print(f"Violations: {info['violations']}")
\ No newline at end of file
+    def reset(self):
+        '''
+        Returns:
+            (np.ndarray): int32 (num_envs, 2 + n) states, laid out as in _step_kernel.
+        '''
+        self.states = np.zeros((self.num_envs, 2 + self._n), dtype=np.int32)
+        self.dones = np.zeros(self.num_envs, dtype=np.bool_)
+        return self.states
+
+    def step(self, actions):
+        '''
+        Args:
+            actions (np.ndarray): One action id per env (ignored for envs that are already done).
+
+        Returns:
+            (tuple): states, rewards (np.ndarray int32), dones (np.ndarray bool).
+        '''
+        actions = np.asarray(actions, dtype=np.int32)
+        check_actions(actions, -1, len(ACTIONS))
+        states = self.states
+        n = self._n
+        step = states[:, 0].copy()
+        live = ~self.dones
+        rewards = np.zeros(self.num_envs, dtype=np.int32)
+
+        # Ingredient prep: same rule as _step_kernel, for every env at once.
+        prep = live & (step < n)
+        rows, cols = self._rows[prep], step[prep]
+        ok = self._valid_table[cols, states[rows, 2 + cols], actions[prep]].astype(np.int32)
+        states[rows, 2 + cols] += ok
+        rewards[rows] += 15 * ok - 5
+
+        advance = (ok == 0) | (states[rows, 2 + cols] >= self._prep_flow_len[cols])
+        rows, cols, ok = rows[advance], cols[advance], ok[advance]
+        states[rows, 1] += ok * self._calorie_table[cols]
+        states[rows, 0] = cols + 1
+        violated = self._allergy_table[cols] + (states[rows, 1] > self._calorie_limit)
+        rewards[rows] -= 2 * violated
+
+        mix = live & (step == n)
+        mixed = mix & (actions == MIX)
+        states[mixed, 0] += 1
+        rewards[mixed] += 10
+        rewards[mix & ~mixed] -= 5
+
+        serve = live & (step == n + 1)
+        served = serve & (actions == SERVE)
+        rewards[served] += 10
+        rewards[serve & ~served] -= 5
+
+        dones = live & (served | (states[:, 0] >= self._max_steps))
+        self.dones |= dones
+        return states, rewards, dones
+
+
+if __name__ == "__main__":
+    recipe = {
+        "tomato": {"type": "Vegetable", "quantity": 2, "prep_method": "Dice"},
+        "carrot": {"type": "Vegetable", "quantity": 3, "prep_method": "Shred"}, 
+        "lettuce": {"type": "Vegetable", "quantity": 1, "prep_method": "Chop"},
+        "spinach": {"type": "Vegetable", "quantity": 1},  # just add whole
+        "sesame_dressing": {"type": "Dressing", "quantity": 10},
+        "almonds": {"type": "Nuts", "quantity": 10, "prep_method": "Grind"},
+        "walnuts": {"type": "Nuts", "quantity": 15}  # just roast and add whole
+    }
+
+    constraints = {
+        "calories": 300,
+        "allergies": ["nut"]
+    }
+
+    env = SaladMakingEnv(recipe, constraints, verbose=True)
+    obs = env.reset()
+
+    for code in env.get_action_codes():
+        obs, reward, done, info = env.step_by_code(code)
+        if done:
+            break
+
+    print(f"Total reward: {env.reward}, Violations: {info['violations']}")
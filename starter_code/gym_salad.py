@@ -1,95 +1,222 @@
-# Importing necessary libraries for OpenAI Gym
-import gym
-from gym import Env, spaces
-import numpy as np
-
-# Define a custom environment for Salad-Making MDP
-class SaladMakingEnv(Env):
-    def __init__(self):
-        super(SaladMakingEnv, self).__init__()
-        
-        # Define action space: Measure, Clean, Cut, Mix, Add Dressing, Serve, Clarify, Substitute
-        self.action_space = spaces.Discrete(6)
-        
-        # Define state space: 10 possible states in the salad-making process
-        self.observation_space = spaces.Discrete(8)
-        
-        # State mapping
-        self.states = [
-            "Start", "Measuring", "Cleaning", "Cutting", "Mixing", 
-            "Dressing", "Serving", "Task Complete"
-        ]
-        
-        # Actions mapping
-        self.actions = [
-            "Measure", "Clean", "Cut", "Mix", "Add Dressing", 
-            "Serve", "Invalid"
-        ]
-        
-        # Initial state
-        self.state = 0  # Start state
-        
-        # Reward mapping
-        self.rewards = {
-            "Measure": 10, "Clean": 10, "Cut": 10, 
-            "Mix": 10, "Add Dressing": 10, "Serve": 100,
-            "Invalid": -10
-        }
-        
-        # Transition mapping
-        self.transitions = {
-            0: {"Measure": 1}, # Start -> Measuring or Clarification
-            1: {"Clean": 2},   # Measuring -> Cleaning or Clarification
-            2: {"Cut": 3},     # Cleaning -> Cutting or Clarification
-            3: {"Mix": 4},     # Cutting -> Mixing or Clarification
-            4: {"Add Dressing": 5},  # Mixing -> Dressing or Clarification
-            5: {"Serve": 6},   # Dressing -> Serving or Clarification
-            6: {"Complete": 7},              # Serving -> Task Complete
-        }
-
-    def step(self, action):
-        # Get action name
-        action_name = self.actions[action]
-        
-        # Determine the next state
-        if action_name in self.transitions[self.state]:
-            next_state = self.transitions[self.state][action_name]
-        else:
-            next_state = self.state  # No state change for invalid actions
-            action_name = "Invalid"  # Mark as invalid action
-        
-        # Calculate reward
-        reward = self.rewards.get(action_name, -10)
-        
-        # Check if the episode is done
-        done = self.state == 7  # Task Complete state
-        
-        # Update the state
-        self.state = next_state
-        
-        # Return step information
-        return self.state, reward, done, {}
-
-    def reset(self):
-        # Reset to the initial state
-        self.state = 0
-        return self.state
-
-    def render(self, mode="human"):
-        # Display the current state
-        print(f"Current State: {self.states[self.state]}")
-
-# Create the environment
-env = SaladMakingEnv()
-
-# Test the environment
-obs = env.reset()
-env.render()
-
-done = False
-while not done:
-    # Take a random action
-    action = env.action_space.sample()
-    obs, reward, done, info = env.step(action)
-    env.render()
-    print(f"Reward: {reward}")
+# Importing necessary libraries for OpenAI Gym
+import argparse
+import gym
+from gym import Env, spaces
+import numpy as np
+
+from jit_utils import check_actions, njit
+
+STATES = ("Start", "Measuring", "Cleaning", "Cutting", "Mixing", "Dressing", "Serving", "Task Complete")
+ACTIONS = ("Measure", "Clean", "Cut", "Mix", "Add Dressing", "Serve", "Invalid")
+NUM_ACTIONS = len(ACTIONS) - 1  # "Invalid" labels a reward, it can't be chosen.
+REWARDS = {
+    "Measure": 10, "Clean": 10, "Cut": 10,
+    "Mix": 10, "Add Dressing": 10, "Serve": 100,
+    "Invalid": -10
+}
+TRANSITIONS = {
+    0: {"Measure": 1}, # Start -> Measuring or Clarification
+    1: {"Clean": 2},   # Measuring -> Cleaning or Clarification
+    2: {"Cut": 3},     # Cleaning -> Cutting or Clarification
+    3: {"Mix": 4},     # Cutting -> Mixing or Clarification
+    4: {"Add Dressing": 5},  # Mixing -> Dressing or Clarification
+    5: {"Serve": 6},   # Dressing -> Serving or Clarification
+    6: {"Complete": 7},              # Serving -> Task Complete
+}
+COMPLETE = STATES.index("Task Complete")
+INVALID_REWARD = REWARDS["Invalid"]
+
+def build_tables(transitions, rewards):
+    '''
+    Args:
+        transitions (dict): state (int) --> {action name (str): next state (int)}.
+        rewards (dict): action name (str) --> reward.
+
+    Returns:
+        (tuple):
+            T (np.ndarray int8 [state, action] --> next state, -1 if invalid),
+            R (np.ndarray int32 [state, action] --> reward, INVALID_REWARD where T is -1),
+            D (np.ndarray bool [state] --> True for Task Complete).
+    '''
+    T = np.full((len(STATES), len(ACTIONS)), -1, dtype=np.int8)
+    R = np.full((len(STATES), len(ACTIONS)), INVALID_REWARD, dtype=np.int32)
+    for state, moves in transitions.items():
+        for action_name, next_state in moves.items():
+            if action_name in ACTIONS:
+                T[state, ACTIONS.index(action_name)] = next_state
+                R[state, ACTIONS.index(action_name)] = rewards.get(action_name, INVALID_REWARD)
+    D = np.zeros(len(STATES), dtype=np.bool_)
+    D[COMPLETE] = True
+    return T, R, D
+
+T, R, D = build_tables(TRANSITIONS, REWARDS)
+
+@njit(cache=True)
+def _step(state, action, T, R, D):
+    '''
+    Args:
+        state (int)
+        action (int): Index into ACTIONS.
+        T, R, D (np.ndarray): Tables from build_tables.
+
+    Returns:
+        (tuple): next state (int), reward (int), done (bool). Invalid actions leave the state
+            unchanged. As before, done reports whether @state (not the next state) is Task Complete.
+    '''
+    next_state = T[state, action]
+    if next_state < 0:
+        next_state = state
+    return next_state, R[state, action], D[state]
+
+def transition(state, action):
+    '''
+    Args:
+        state (int)
+        action (int): Index into ACTIONS.
+
+    Returns:
+        (tuple): next state (int), reward (int), done (bool); the env's step without the env.
+    '''
+    check_actions(action, 0, T.shape[1])
+    next_state, reward, done = _step(state, action, T, R, D)
+    return int(next_state), int(reward), bool(done)
+
+def step_batch(states, actions):
+    '''
+    Args:
+        states (np.ndarray): int32 state per env.
+        actions (np.ndarray): Action index per env.
+
+    Returns:
+        (tuple): next states, rewards, dones (np.ndarray each); same rule as _step for every env at once.
+    '''
+    check_actions(actions, 0, T.shape[1])
+    next_states = T[states, actions]
+    return np.where(next_states >= 0, next_states, states), R[states, actions], D[states]
+
+@njit(cache=True)
+def _rollout_batch(states, actions, T, R, D):
+    '''
+    Args:
+        states (np.ndarray): int32 (num_envs,) start states, updated in place.
+        actions (np.ndarray): int (num_envs, num_steps) actions to apply.
+        T, R, D (np.ndarray): Tables from build_tables.
+
+    Returns:
+        (tuple): rewards (np.ndarray int32) and dones (np.ndarray bool), both (num_envs, num_steps).
+    '''
+    num_envs, num_steps = actions.shape
+    rewards = np.zeros((num_envs, num_steps), dtype=np.int32)
+    dones = np.zeros((num_envs, num_steps), dtype=np.bool_)
+    for t in range(num_steps):
+        for e in range(num_envs):
+            states[e], rewards[e, t], dones[e, t] = _step(states[e], actions[e, t], T, R, D)
+    return rewards, dones
+
+def rollout(rng, num_envs, num_steps, states=None):
+    '''
+    Args:
+        rng (np.random.Generator): Source of the uniformly random actions.
+        num_envs (int)
+        num_steps (int)
+        states (np.ndarray): Start states (defaults to every env at Start).
+
+    Returns:
+        (tuple): final states, rewards, dones, rng.
+
+    Summary:
+        Runs @num_envs random-action episodes of @num_steps in one compiled call.
+    '''
+    states = np.zeros(num_envs, dtype=np.int32) if states is None else np.array(states, dtype=np.int32)
+    actions = rng.integers(0, NUM_ACTIONS, size=(num_envs, num_steps), dtype=np.int32)
+    rewards, dones = _rollout_batch(states, actions, T, R, D)
+    return states, rewards, dones, rng
+
+# Compile once at import so the first env.step / rollout doesn't pay for it.
+_step(0, 0, T, R, D)
+_rollout_batch(np.zeros(1, dtype=np.int32), np.zeros((1, 1), dtype=np.int32), T, R, D)
+
+# Define a custom environment for Salad-Making MDP
+class SaladMakingEnv(Env):
+    def __init__(self):
+        super(SaladMakingEnv, self).__init__()
+        
+        # Define action space: Measure, Clean, Cut, Mix, Add Dressing, Serve, Clarify, Substitute
+        self.action_space = spaces.Discrete(NUM_ACTIONS)
+        
+        # Define state space: 10 possible states in the salad-making process
+        self.observation_space = spaces.Discrete(8)
+        
+        # State mapping
+        self.states = list(STATES)
+        
+        # Actions mapping
+        self.actions = list(ACTIONS)
+        
+        # Initial state
+        self.state = 0  # Start state
+        
+        # Reward mapping
+        self.rewards = dict(REWARDS)
+        
+        # Transition mapping
+        self.transitions = {state: dict(moves) for state, moves in TRANSITIONS.items()}
+        self.T, self.R, self.D = T, R, D
+
+    def step(self, action):
+        # Invalid actions leave the state unchanged and get INVALID_REWARD.
+        check_actions(action, 0, self.T.shape[1])
+        next_state, reward, done = _step(self.state, action, self.T, self.R, self.D)
+        self.state = int(next_state)
+        
+        # Return step information
+        return self.state, int(reward), bool(done), {}
+
+    def reset(self):
+        # Reset to the initial state
+        self.state = 0
+        return self.state
+
+    def render(self, mode="human"):
+        # Display the current state
+        print(f"Current State: {self.states[self.state]}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one random-action episode of the salad-making env.")
+    parser.add_argument("--quiet", action="store_true", help="Only print the final state and totals, not every step")
+    args = parser.parse_args()
+    verbose = not args.quiet
+
+    # Create the environment
+    env = SaladMakingEnv()
+
+    # Test the environment
+    obs = env.reset()
+
+    # Random actions are drawn a block at a time rather than one sample() per step.
+    rng = np.random.default_rng()
+    block_size = 10000
+    actions = rng.integers(0, env.action_space.n, size=block_size, dtype=np.int8)
+    i = 0
+
+    # "Task Complete" can't be reached from Serving, so cap the episode instead of looping forever.
+    max_steps = 1000
+    log = []
+
+    done = False
+    while not done and len(log) < max_steps:
+        # Take a random action
+        if i == block_size:
+            actions = rng.integers(0, env.action_space.n, size=block_size, dtype=np.int8)
+            i = 0
+        action = int(actions[i])
+        i += 1
+        obs, reward, done, info = env.step(action)
+        log.append((action, obs, reward))
+
+    # Dump the trace once, after the loop.
+    if verbose:
+        for action, state, reward in log:
+            print(f"Action: {ACTIONS[action]} | Current State: {STATES[state]} | Reward: {reward}")
+    env.render()
+    print(f"Steps: {len(log)}, Total reward: {sum(reward for _, _, reward in log)}")
@@ -0,0 +1,32 @@
+''' jit_utils.py: Optional numba support for the salad environments. '''
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    print("Warning: numba not installed (kernels will run as plain Python).")
+
+    def njit(*args, **kwargs):
+        ''' Stand-in for numba.njit that returns the function unchanged. '''
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+def check_actions(actions, low, high):
+    '''
+    Args:
+        actions (int or np.ndarray): Action indices about to be passed to a compiled kernel.
+        low (int): Smallest valid index.
+        high (int): One past the largest valid index.
+
+    Summary:
+        Raises IndexError unless every action is in [@low, @high). Compiled kernels index their
+        tables without bounds checks, so an out-of-range action would silently read garbage.
+    '''
+    if np.ndim(actions) == 0:
+        if not low <= actions < high:
+            raise IndexError(f"Action must be in [{low}, {high}), got {actions}")
+    elif np.size(actions) and (np.min(actions) < low or np.max(actions) >= high):
+        raise IndexError(f"Actions must be in [{low}, {high}), got values from {np.min(actions)} to {np.max(actions)}")
@@ -1,3 +1,5 @@
+import numpy as np
+
 from simple_rl.mdp.MDPClass import MDP
 from simple_rl.mdp.StateClass import State
 from simple_rl.planning.ValueIterationClass import ValueIteration
@@ -26,31 +28,46 @@ def reward_func(state, action):
     return -10  # Penalty for invalid actions or constraint violations
 
 # Define transitions: A dictionary to simulate the FSM
+TRANSITION_DICT = {
+    "Start": {"Measure": "Measuring", "Clarify": "Clarification"},
+    "Measuring": {"Clean": "Cleaning", "Clarify": "Clarification"},
+    "Cleaning": {"Cut": "Cutting", "Clarify": "Clarification"},
+    "Cutting": {"Mix": "Mixing", "Clarify": "Clarification"},
+    "Mixing": {"Add Dressing": "Dressing", "Clarify": "Clarification"},
+    "Dressing": {"Serve": "Serving", "Clarify": "Clarification"},
+    "Serving": {"Complete": "Task Complete", "Clarify": "Clarification"},
+    "Clarification": {"Substitute": "Substitute", "Measure": "Measuring"},
+    "Substitute": {"Measure": "Measuring"},
+}
+
+# The same transitions as an int8 (state, action) -> next state table (-1 means stay put).
+# The clarification states and actions only appear in the transitions, so they are appended here.
+STATE_NAMES = states + ["Clarification", "Substitute"]
+ACTION_NAMES = actions + ["Clarify", "Complete", "Substitute"]
+STATE_IDX = {name: i for i, name in enumerate(STATE_NAMES)}
+ACTION_IDX = {name: i for i, name in enumerate(ACTION_NAMES)}
+TRANSITIONS = np.full((len(STATE_NAMES), len(ACTION_NAMES)), -1, dtype=np.int8)
+for _s, _row in TRANSITION_DICT.items():
+    for _a, _next in _row.items():
+        TRANSITIONS[STATE_IDX[_s], ACTION_IDX[_a]] = STATE_IDX[_next]
+
 def transition_func(state, action):
-    transitions = {
-        "Start": {"Measure": "Measuring", "Clarify": "Clarification"},
-        "Measuring": {"Clean": "Cleaning", "Clarify": "Clarification"},
-        "Cleaning": {"Cut": "Cutting", "Clarify": "Clarification"},
-        "Cutting": {"Mix": "Mixing", "Clarify": "Clarification"},
-        "Mixing": {"Add Dressing": "Dressing", "Clarify": "Clarification"},
-        "Dressing": {"Serve": "Serving", "Clarify": "Clarification"},
-        "Serving": {"Complete": "Task Complete", "Clarify": "Clarification"},
-        "Clarification": {"Substitute": "Substitute", "Measure": "Measuring"},
-        "Substitute": {"Measure": "Measuring"},
-    }
+    # The state's name is its data (e.g. State("Start")).
+    s, a = STATE_IDX.get(state.data), ACTION_IDX.get(action)
+    next_state = TRANSITIONS[s, a] if s is not None and a is not None else -1
     # Return the next state based on the current state and action
-    next_state = transitions.get(state.name, {}).get(action, state.name)
-    return State(next_state)
+    return State(STATE_NAMES[next_state] if next_state >= 0 else state.data)
 
-# Create the MDP
-initial_state = State("Start")
-salad_mdp = MDP(actions, transition_func, reward_func, initial_state)
+if __name__ == "__main__":
+    # Create the MDP
+    initial_state = State("Start")
+    salad_mdp = MDP(actions, transition_func, reward_func, initial_state)
 
-# Run Value Iteration to find the optimal policy
-vi = ValueIteration(salad_mdp)
-vi.run_vi()
-optimal_policy = vi.get_policy()
+    # Run Value Iteration to find the optimal policy
+    vi = ValueIteration(salad_mdp)
+    vi.run_vi()
+    optimal_policy = vi.get_policy()
 
-# Display the optimal policy
-for state in optimal_policy:
-    print(f"State: {state}, Optimal Action: {optimal_policy[state]}")
+    # Display the optimal policy
+    for state in optimal_policy:
+        print(f"State: {state}, Optimal Action: {optimal_policy[state]}")
@@ -1,10 +1,13 @@
 import argparse
+import multiprocessing
+import os
 import matplotlib.pyplot as plt
 import numpy as np
 import pickle
-from collections import defaultdict
-from updated_mdp import SaladEnv  # assumes train_agent and test_policy not needed here
+from updated_mdp import SaladEnv, BatchedSaladEnv  # assumes train_agent and test_policy not needed here
 
+# Keys of SaladEnv.violations, in the order of the violation count arrays.
+VIOLATION_KEYS = ("calories", "allergies", "availability")
 
 TEST_RECIPES = [
     {
@@ -36,83 +39,91 @@ TEST_RECIPES = [
 ]
 
 
-def run_trial(env, Q_table, seed=None):
+def count_violations(violations_dict, aggregate_counts):
     """
-    Executes one trial in the environment using the greedy policy from the Q-table.
+    Tallies violations from a single trial into the running total.
 
     Args:
-        env (SaladEnv): The initialized environment.
-        Q_table (np.ndarray): The pre-trained Q-table.
-        seed (int): Optional random seed for reproducibility.
-
-    Returns:
-        total_reward (float): Cumulative reward obtained in the episode.
-        env.violations (dict): Constraint violations collected during the trial.
+        violations_dict (dict): Violation info returned from the environment.
+        aggregate_counts (np.ndarray): int64 running total of each violation type, indexed like VIOLATION_KEYS.
     """
+    for i, k in enumerate(VIOLATION_KEYS):
+        v = violations_dict.get(k)
+        if isinstance(v, (list, dict)):
+            aggregate_counts[i] += len(v)
+        else:
+            aggregate_counts[i] += int(bool(v))
 
-    if seed is not None:
-        np.random.seed(seed)
-        #env.seed(seed)
 
-    state = env.reset()
-    done = False
-    total_reward = 0
+# Set in each worker by _init_worker, so the policy is sent once per process, not once per task.
+_GREEDY = None
 
-    while not done:
-        action = np.argmax(Q_table[state, :])
-        state, reward, done, info = env.step(action)
-        total_reward += reward
 
-    return total_reward, env.violations
+def _init_worker(greedy):
+    global _GREEDY
+    _GREEDY = greedy
 
 
-def count_violations(violations_dict, aggregate_counts):
+def _eval_one_recipe(args):
     """
-    Tallies violations from a single trial into the running total.
+    Evaluates the greedy policy (set by _init_worker) on one test recipe.
 
     Args:
-        violations_dict (dict): Violation info returned from the environment.
-        aggregate_counts (defaultdict): Running total of each violation type.
+        args (tuple): (index, test_case, num_trials).
+
+    Returns:
+        (tuple): recipe name, rewards (list), violation counts (dict).
     """
-    for k, v in violations_dict.items():
-        if isinstance(v, (list, dict)):
-            count = len(v)
-        else:
-            count = int(bool(v))
-        aggregate_counts[k] += count
+    i, test_case, num_trials = args
+    env = SaladEnv(test_case["recipe"], test_case["constraints"])
+
+    # The greedy policy and the env have no randomness, so every trial from reset()
+    # follows the same trajectory: roll it out once and count it num_trials times.
+    batch = BatchedSaladEnv(env, 1)
+    reward = int(batch.rollout(_GREEDY)[0])
+    violations = batch.get_violations(0)
+
+    rewards = [reward] * num_trials
+    violation_counts = np.zeros(len(VIOLATION_KEYS), dtype=np.int64)
+    count_violations(violations, violation_counts)
+    violation_counts *= num_trials
 
+    return f"Recipe {i+1}", rewards, dict(zip(VIOLATION_KEYS, violation_counts.tolist()))
 
-def evaluate_policy(Q_table, num_trials=10):
+
+def evaluate_policy(Q_table, num_trials=10, processes=1):
     """
     Evaluates the Q-table policy on each test recipe multiple times.
 
     Args:
         Q_table (np.ndarray): Trained Q-table.
         num_trials (int): Number of trials to run per recipe.
+        processes (int): Worker processes, one recipe each. Each recipe is a single short
+            rollout, so the default evaluates in-process; a pool only pays off for large recipe sets.
 
     Returns:
         results (dict): Mapping from recipe names to rewards and violations.
     """
-    results = {}
-    for i, test_case in enumerate(TEST_RECIPES):
-        print(f"\nEvaluating Recipe {i+1} with constraints: {test_case['constraints']}")
-        env = SaladEnv(test_case["recipe"], test_case["constraints"])
-
-        rewards = []
-        violation_counts = defaultdict(int)
-
-        for t in range(num_trials):
-            reward, violations = run_trial(env, Q_table, seed=t)
-            rewards.append(reward)
-            count_violations(violations, violation_counts)
+    # The Q-table is fixed during evaluation, so pick every state's greedy action up front.
+    greedy = np.argmax(Q_table, axis=1)
+    tasks = [(i, test_case, num_trials) for i, test_case in enumerate(TEST_RECIPES)]
+    if processes > 1:
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(greedy,)) as pool:
+            outs = pool.map(_eval_one_recipe, tasks)
+    else:
+        _init_worker(greedy)
+        outs = [_eval_one_recipe(task) for task in tasks]
 
-        results[f"Recipe {i+1}"] = {
+    results = {}
+    for test_case, (name, rewards, violation_counts) in zip(TEST_RECIPES, outs):
+        print(f"\nEvaluating {name} with constraints: {test_case['constraints']}")
+        results[name] = {
             "rewards": rewards,
-            "violations": dict(violation_counts)
+            "violations": violation_counts
         }
 
         print(f"Avg Reward: {np.mean(rewards):.2f}")
-        print(f"Violations: {dict(violation_counts)}")
+        print(f"Violations: {violation_counts}")
 
     return results
 
@@ -144,22 +155,21 @@ def plot_violations(results):
     Args:
         results (dict): Output from evaluate_policy().
     """
-    violation_types = set()
-    for data in results.values():
-        violation_types.update(data["violations"].keys())
+    violation_types = sorted({v for data in results.values() for v in data["violations"]})
 
-    violation_matrix = {v: [] for v in violation_types}
-    for data in results.values():
-        for v in violation_types:
-            violation_matrix[v].append(data["violations"].get(v, 0))
+    # One row per violation type, one column per recipe.
+    violation_matrix = np.zeros((len(violation_types), len(results)), dtype=np.int64)
+    for j, data in enumerate(results.values()):
+        for i, v in enumerate(violation_types):
+            violation_matrix[i, j] = data["violations"].get(v, 0)
 
     x = np.arange(len(results))
     bottom = np.zeros(len(results))
     plt.figure(figsize=(10, 6))
 
-    for v_type, vals in violation_matrix.items():
-        plt.bar(x, vals, bottom=bottom, label=v_type)
-        bottom += np.array(vals)
+    for i, v_type in enumerate(violation_types):
+        plt.bar(x, violation_matrix[i], bottom=bottom, label=v_type)
+        bottom += violation_matrix[i]
 
     plt.xticks(x, list(results.keys()))
     plt.ylabel("Violation Count")
@@ -169,6 +179,23 @@ def plot_violations(results):
     plt.show()
 
 
+def load_q_table(qtable_path: str):
+    """
+    Loads a saved Q-table.
+
+    Args:
+        qtable_path (str): Path to a .npy file (memory-mapped read-only) or a pickle file.
+
+    Returns:
+        Q_table (np.ndarray): The Q-table.
+    """
+    if qtable_path.endswith(".npy"):
+        # Pages are read on demand and shared with the evaluation workers instead of copied.
+        return np.load(qtable_path, mmap_mode="r")
+    with open(qtable_path, "rb") as f:
+        return pickle.load(f)
+
+
 def main(qtable_path: str, num_trials: int):
     """
     Loads the Q-table, evaluates it, and plots the results.
@@ -177,8 +204,7 @@ def main(qtable_path: str, num_trials: int):
         qtable_path (str): Path to the saved Q-table file.
         num_trials (int): Number of evaluation trials per recipe.
     """
-    with open(qtable_path, "rb") as f:
-        Q_table = pickle.load(f)
+    Q_table = load_q_table(qtable_path)
 
     results = evaluate_policy(Q_table, num_trials=num_trials)
     plot_rewards(results)
@@ -187,8 +213,10 @@ def main(qtable_path: str, num_trials: int):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--qtable", type=str, default="trained_q_table.pkl",
-                        help="Path to the trained Q-table pickle file")
+    # updated_mdp.py writes the .npy next to the pickle; only the pickle is versioned.
+    parser.add_argument("--qtable", type=str,
+                        default="trained_q_table.npy" if os.path.exists("trained_q_table.npy") else "trained_q_table.pkl",
+                        help="Path to the trained Q-table (.npy or pickle file)")
     parser.add_argument("--trials", type=int, default=10,
                         help="Number of evaluation trials per recipe")
     args = parser.parse_args()
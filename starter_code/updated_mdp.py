@@ -1,32 +1,208 @@
 from gym import Env
 from gym.spaces import Discrete, Dict
 import numpy as np
-import random
 import pickle
+from types import MappingProxyType
+
+from jit_utils import check_actions, njit
 
 # constraints we want to manage: skill limitation, time limitation, calorie, availability, allergies 
 
-AVAILABLE_INGREDIENTS = {
-    "tomato": {"type": "Vegetable", "calories": 20, "quantity": 3, "allergy": {"tomato"}}, 
-    "carrot": {"type": "Vegetable", "calories": 15, "quantity": 2, "allergy": {"carrot"}}, 
-    "lettuce": {"type": "Vegetable", "calories": 10, "quantity": 1, "allergy": {"lettuce"}}, 
-    "spinach": {"type": "Vegetable", "calories": 12, "quantity": 2, "allergy": {"spinach"}}, 
-    "almonds": {"type": "Nuts", "calories": 50, "quantity": 100, "allergy": {"almond", "nuts"}}, 
-    "sesame_dressing": {"type": "Dressing", "calories": 30, "quantity": 100, "allergy": {"sesame"}},
-    "peanuts": {"type": "Nuts", "calories": 60, "quantity": 100, "allergy": {"peanut", "nuts"}}, 
-    "cucumber": {"type": "Vegetable", "calories": 10, "quantity": 2,  "allergy": {"cucumber"}}, 
-    "onion": {"type": "Vegetable", "calories": 15, "quantity": 2, "allergy": {"onion"}},
-    "cheese": {"type": "Dairy", "calories": 90, "quantity": 50, "allergy": {"cheese", "dairy"}},
-    "croutons": {"type": "Grain", "calories": 80, "quantity": 20, "allergy": {"croutons", "gluten"}}
-}
+# Shared read-only by every SaladEnv.
+AVAILABLE_INGREDIENTS = MappingProxyType({
+    "tomato": MappingProxyType({"type": "Vegetable", "calories": 20, "quantity": 3, "allergy": frozenset({"tomato"})}),
+    "carrot": MappingProxyType({"type": "Vegetable", "calories": 15, "quantity": 2, "allergy": frozenset({"carrot"})}),
+    "lettuce": MappingProxyType({"type": "Vegetable", "calories": 10, "quantity": 1, "allergy": frozenset({"lettuce"})}),
+    "spinach": MappingProxyType({"type": "Vegetable", "calories": 12, "quantity": 2, "allergy": frozenset({"spinach"})}),
+    "almonds": MappingProxyType({"type": "Nuts", "calories": 50, "quantity": 100, "allergy": frozenset({"almond", "nuts"})}),
+    "sesame_dressing": MappingProxyType({"type": "Dressing", "calories": 30, "quantity": 100, "allergy": frozenset({"sesame"})}),
+    "peanuts": MappingProxyType({"type": "Nuts", "calories": 60, "quantity": 100, "allergy": frozenset({"peanut", "nuts"})}),
+    "cucumber": MappingProxyType({"type": "Vegetable", "calories": 10, "quantity": 2, "allergy": frozenset({"cucumber"})}),
+    "onion": MappingProxyType({"type": "Vegetable", "calories": 15, "quantity": 2, "allergy": frozenset({"onion"})}),
+    "cheese": MappingProxyType({"type": "Dairy", "calories": 90, "quantity": 50, "allergy": frozenset({"cheese", "dairy"})}),
+    "croutons": MappingProxyType({"type": "Grain", "calories": 80, "quantity": 20, "allergy": frozenset({"croutons", "gluten"})})
+})
+
+# One bit per allergen that appears in the catalog.
+ALLERGENS = tuple(sorted(set().union(*(details.get("allergy", set()) for details in AVAILABLE_INGREDIENTS.values()))))
+ALLERGEN_BIT = {name: 1 << i for i, name in enumerate(ALLERGENS)}
+
+def allergen_mask(allergens):
+    '''
+    Args:
+        allergens (iterable): Allergen names; names outside ALLERGENS are ignored, since
+            no catalog ingredient can contain them.
+
+    Returns:
+        (int): Bitmask with the bit of each known allergen set.
+    '''
+    mask = 0
+    for name in allergens:
+        mask |= ALLERGEN_BIT.get(name, 0)
+    return mask
+
+def allergen_names(mask):
+    return {name for name in ALLERGENS if mask & ALLERGEN_BIT[name]}
+
+# Same order as SaladEnv.action_map.
+ACTIONS = ("Measure", "Wash", "Chop", "Dice", "Shred", "Crush", "Grind", "Roast", "Combine")
+NUM_ACTIONS = len(ACTIONS)
+ACTION_INDEX = {name: i for i, name in enumerate(ACTIONS)}
+MEASURE, WASH, CHOP, DICE, SHRED, CRUSH, GRIND, ROAST, COMBINE = range(NUM_ACTIONS)
+
+# Recipe "type" codes; any other type gets len(INGREDIENT_TYPES).
+INGREDIENT_TYPES = ("Vegetable", "Nuts", "Dressing")
+VEGETABLE, NUTS, DRESSING = range(len(INGREDIENT_TYPES))
+
+@njit(cache=True)
+def action_bit(action):
+    '''
+    Args:
+        action (int): Index into ACTIONS.
+
+    Returns:
+        (int): The bit for @action in an actions-taken mask. Bits are laid out as in
+            encode_state, i.e. Measure is the most significant bit.
+    '''
+    return 1 << (NUM_ACTIONS - 1 - action)
+
+# Action masks used by the reward rules, laid out as in action_bit.
+ROAST_AFTER_PREP_MASK = sum(1 << (NUM_ACTIONS - 1 - a) for a in (DICE, CRUSH, GRIND))
+BASE_REQUIRED_MASK = 1 << (NUM_ACTIONS - 1 - MEASURE)  # Dressings and any other type
+VEG_REQUIRED_MASK = BASE_REQUIRED_MASK | 1 << (NUM_ACTIONS - 1 - WASH)
+NUT_REQUIRED_MASK = BASE_REQUIRED_MASK | 1 << (NUM_ACTIONS - 1 - ROAST)
+
+@njit(cache=True)
+def _reward_kernel(mask, action, ing_type, prep_action):
+    '''
+    Args:
+        mask (int): Actions already taken on the current ingredient (see action_bit).
+        action (int)
+        ing_type (int): Code from INGREDIENT_TYPES.
+        prep_action (int): The ingredient's correct prep method (-1 if it has none).
+
+    Returns:
+        (int): The reward SaladEnv.calculate_reward gives @action.
+    '''
+    # Ensure first action is "Measure"
+    if mask == 0:
+        return 100 if action == MEASURE else -100
+
+    reward = 0
+    if action == WASH:
+        if ing_type == VEGETABLE:
+            reward += 50 if mask & action_bit(WASH) == 0 else -25
+        else:
+            reward -= 100
+
+    if action == ROAST:
+        if ing_type == NUTS:
+            if mask & ROAST_AFTER_PREP_MASK:
+                reward += 75
+            elif mask & action_bit(ROAST) == 0:
+                reward += 125
+            else:
+                reward -= 10
+        else:
+            reward -= 100
+
+    if ing_type == DRESSING and action != MEASURE and action != COMBINE:
+        reward -= 100
+
+    if action == CHOP or action == DICE or action == SHRED or action == CRUSH or action == GRIND:
+        reward += 75 if action == prep_action else -50
+
+    if mask & action_bit(action):
+        reward -= 50
+
+    if action == COMBINE:
+        if ing_type == VEGETABLE:
+            required = VEG_REQUIRED_MASK
+        elif ing_type == NUTS:
+            required = NUT_REQUIRED_MASK
+        else:
+            required = BASE_REQUIRED_MASK
+        if mask & required == required:
+            reward += 100
+
+    return reward
+
+@njit(cache=True)
+def _build_reward_table(ing_types, ing_preps, ing_available):
+    '''
+    Args:
+        ing_types (np.ndarray): Type code per recipe ingredient.
+        ing_preps (np.ndarray): Prep action per recipe ingredient (-1 for none).
+        ing_available (np.ndarray): bool per recipe ingredient.
+
+    Returns:
+        (np.ndarray): int16 (num_ingredients, 2**NUM_ACTIONS, NUM_ACTIONS) table of
+            the reward for every (ingredient, actions-taken mask, action).
+    '''
+    n = ing_types.shape[0]
+    table = np.empty((n, 1 << NUM_ACTIONS, NUM_ACTIONS), dtype=np.int16)
+    for i in range(n):
+        for mask in range(1 << NUM_ACTIONS):
+            for action in range(NUM_ACTIONS):
+                if ing_available[i]:
+                    table[i, mask, action] = _reward_kernel(mask, action, ing_types[i], ing_preps[i])
+                else:
+                    table[i, mask, action] = -500
+    return table
+
+@njit(cache=True)
+def _step_kernel(ing_idx, mask, action, reward_table):
+    '''
+    Args:
+        ing_idx (int): Index of the current ingredient in the recipe.
+        mask (int): Actions taken on it so far.
+        action (int)
+        reward_table (np.ndarray): From _build_reward_table.
+
+    Returns:
+        (tuple): ing_idx, mask, reward, done after @action; the numeric version of SaladEnv.step.
+    '''
+    reward = reward_table[ing_idx, mask, action]
+    if action == COMBINE:
+        if ing_idx + 1 < reward_table.shape[0]:
+            return ing_idx + 1, 0, reward, False
+        return ing_idx, 0, reward, True
+    return ing_idx, mask | action_bit(action), reward, False
+
+@njit(cache=True)
+def _build_transition_table(num_ingredients):
+    '''
+    Args:
+        num_ingredients (int)
+
+    Returns:
+        (tuple): next state and done, each (num_ingredients * 2**NUM_ACTIONS, NUM_ACTIONS),
+            for every (encoded state, action), as _step_kernel would give them.
+    '''
+    num_states = num_ingredients * (1 << NUM_ACTIONS)
+    next_states = np.empty((num_states, NUM_ACTIONS), dtype=np.int32)
+    dones = np.zeros((num_states, NUM_ACTIONS), dtype=np.bool_)
+    for state in range(num_states):
+        ing_idx, mask = state >> NUM_ACTIONS, state & ((1 << NUM_ACTIONS) - 1)
+        for action in range(NUM_ACTIONS):
+            if action == COMBINE:
+                if ing_idx + 1 < num_ingredients:
+                    next_states[state, action] = (ing_idx + 1) << NUM_ACTIONS
+                else:
+                    next_states[state, action] = ing_idx << NUM_ACTIONS
+                    dones[state, action] = True
+            else:
+                next_states[state, action] = state | action_bit(action)
+    return next_states, dones
 
 class SaladEnv(Env): 
-    def __init__(self, recipe, constraints):
+    def __init__(self, recipe, constraints, verbose=False):
         super(SaladEnv, self).__init__()
 
         # Recipe and Constraints are user defined
         self.recipe = recipe 
         self.constraints = constraints 
+        self.verbose = verbose  # Print each combined ingredient when the episode ends
 
         self.violations = {"calories": 0, "allergies": [], "availability":{}}
 
@@ -39,11 +215,25 @@ class SaladEnv(Env):
         self.action_space = Discrete(len(self.action_map))
         self.state_space = len(recipe.keys()) * len(self.action_map)
         self.observation_space = Discrete(self.state_space)
-        self.completed_ingredients = set()
         self.warnings = []
 
         self.current_calories = 0
         self.available_ingredients = AVAILABLE_INGREDIENTS
+
+        # Numeric copy of the recipe, one entry per ingredient in recipe order.
+        self.ing_type = np.array([INGREDIENT_TYPES.index(d["type"]) if d["type"] in INGREDIENT_TYPES else len(INGREDIENT_TYPES)
+                                  for d in recipe.values()], dtype=np.int8)
+        self.ing_prep = np.array([ACTIONS.index(d["prep_method"]) if d["prep_method"] in ACTIONS else -1
+                                  for d in recipe.values()], dtype=np.int8)
+        self.ing_available = np.array([bool(self.available_ingredients.get(name, True)) for name in recipe], dtype=np.bool_)
+        self.ing_calories = np.array([self.available_ingredients[name].get("calories", 0) for name in recipe], dtype=np.int32)
+        self.ing_allergen_mask = np.array([allergen_mask(self.available_ingredients[name].get("allergy", set())) for name in recipe],
+                                          dtype=np.uint64)
+        self.user_allergy_mask = allergen_mask(self.constraints.get("allergies", []))
+        self.reward_table = _build_reward_table(self.ing_type, self.ing_prep, self.ing_available)
+
+        # Recipe order never changes, so ingredients are picked by position instead of rescanning the recipe.
+        self._recipe_keys = tuple(recipe.keys())
         self.reset()
         
  
@@ -55,67 +245,37 @@ class SaladEnv(Env):
         reward = self.calculate_reward(action_name)
         
         self.state["actions_taken"].append(action_name)
+        self.action_mask |= action_bit(action)
 
         if action_name == "Combine":
-            self.completed_ingredients.add(self.current_ingredient)
-            print(f"\nIngredient: {self.state['ingredient']} | Action: {action_name} | Reward: {reward}")
-            print(f"Actions Taken: {self.state['actions_taken']}")
+            self._next_idx = self.ingredient_idx + 1
+            if self.verbose:
+                self._log.append(f"\nIngredient: {self.state['ingredient']} | Action: {action_name} | Reward: {reward}")
+                self._log.append(f"Actions Taken: {self.state['actions_taken']}")
             self.state = self.set_next_ingredient()
+            if self.done and self._log:
+                print("\n".join(self._log))
+                self._log = []
 
         return self.encode_state(), reward, self.done, {"warnings": self.warnings, "violations": self.violations}
 
     def calculate_reward(self, action_name):
-        reward = 0
-        previous_actions = self.state["actions_taken"]
-        ingredient_type = self.state["type"]
-        correct_prep_method = self.state["prep_method"]
+        i = self.ingredient_idx
         ingredient_name = self.state["ingredient"]
 
         # Prevent using unavailable ingredients
-        if not self.available_ingredients.get(ingredient_name, True):
+        if not self.ing_available[i]:
             return -500
 
-        # Ensure first action is "Measure"
-        if len(previous_actions) == 0:
-            return 100 if action_name == "Measure" else -100
-        
-        # Ensure only vegetables are washed
-        if action_name == "Wash":
-            if ingredient_type == "Vegetable":
-                reward += 50 if "Wash" not in previous_actions else -25
-            else:
-                reward -= 100  # Harsh penalty for washing non-vegetables
-
-        if action_name == "Roast":
-            if ingredient_type == "Nuts":
-                if any(act in previous_actions for act in {"Grind", "Crush", "Dice"}):
-                    reward += 75  # Normal reward for roasting
-                elif "Roast" not in previous_actions:
-                    reward += 125  # Encourage roasting before processing
-                else:
-                    reward -= 10  # Small penalty for repeating roast
-            else:
-                reward -= 100  # Harsh penalty for roasting non-nuts
-
-        # Ensure dressing only has "Measure" and "Combine"
-        if ingredient_type == "Dressing":
-            if action_name not in {"Measure", "Combine"}:
-                reward -= 100  # Penalize invalid actions for dressing
-
-        # Reward correct processing action
-        if action_name in {"Chop", "Dice", "Shred", "Crush", "Grind"}:
-            if action_name == correct_prep_method:
-                reward += 75  
-            else:
-                reward -= 50  
+        # The action rules (Measure first, wash/roast/prep checks, repeats, Combine bonus).
+        reward = int(self.reward_table[i, self.action_mask, ACTION_INDEX[action_name]])
 
-        # Penalize repeating an action but not too harshly
-        if action_name in previous_actions:
-            reward -= 50  
+        # The first action of an ingredient isn't checked against the constraints.
+        if self.action_mask == 0:
+            return reward
 
         # Calorie constraint tracking
-        ingredient_calories = self.available_ingredients[ingredient_name].get("calories", 0)
-        self.current_calories += ingredient_calories  # Track total calories
+        self.current_calories += int(self.ing_calories[i])  # Track total calories
 
         calorie_limit = self.constraints.get("calories", float("inf"))
         if self.current_calories > calorie_limit:
@@ -125,20 +285,12 @@ class SaladEnv(Env):
             self.warnings.append(f"Warning: Calorie limit exceeded by {overshoot} calories!")
 
         # Allergy Constraint Handling
-        if ingredient_name in self.available_ingredients:
-            allergens = self.available_ingredients[ingredient_name].get("allergy", set())
-            user_allergies = set(self.constraints.get("allergies", []))
-            
-            if allergens & user_allergies:  # Intersection means violation
-                if ingredient_name not in self.violations["allergies"]:
-                    self.violations["allergies"].append(ingredient_name)  # Log violation
-                #reward -= 100  # Apply penalty
-                self.warnings.append(f"Warning: Allergy violation! {ingredient_name} contains allergens: {allergens & user_allergies}")
-
-
-        # Reward completing ingredient correctly
-        if action_name == "Combine" and set(previous_actions) >= self.get_required_actions():
-            reward += 100  
+        hit = int(self.ing_allergen_mask[i]) & self.user_allergy_mask
+        if hit:  # Intersection means violation
+            if ingredient_name not in self.violations["allergies"]:
+                self.violations["allergies"].append(ingredient_name)  # Log violation
+            #reward -= 100  # Apply penalty
+            self.warnings.append(f"Warning: Allergy violation! {ingredient_name} contains allergens: {allergen_names(hit)}")
 
         return reward 
     
@@ -159,27 +311,21 @@ class SaladEnv(Env):
         return ingredient_index * len(self.action_map) + int("".join(map(str, action_vector)), 2)'''
     
     def encode_state(self):
-        # Get the index of the current ingredient in the recipe's ingredient list
-        ingredient_index = list(self.recipe.keys()).index(self.current_ingredient)
-
-        # Create a binary vector representing which actions have been taken for the current ingredient
-        # 1 if the action has been taken, 0 otherwise
-        action_vector = [1 if action in self.state["actions_taken"] else 0 for action in self.action_map.values()]
-
-        # Convert the binary vector (e.g., [0, 1, 1, 0, 0, 0, 1, 0, 0]) to an integer
-        # First join it into a string like "011000100", then convert from binary to integer (e.g., 100)
-        action_bits = int("".join(map(str, action_vector)), 2)
+        # self.action_mask has one bit per action taken on the current ingredient, with the
+        # first action of action_map as the most significant bit (e.g. Wash + Chop -> 0b011000000).
 
         #Encode the overall state as a unique integer:
         # Shift the ingredient's action space by a block of 512 (2^9) to avoid overlaps between ingredients
         # Final state = base offset for ingredient + unique action vector for this ingredient
-        return ingredient_index * (2 ** len(self.action_map)) + action_bits
+        return self.ingredient_idx * (1 << NUM_ACTIONS) + self.action_mask
 
 
     def set_next_ingredient(self):
-        remaining_ingredients = [i for i in self.recipe.keys() if i not in self.completed_ingredients]
-        if remaining_ingredients:
-            self.current_ingredient = remaining_ingredients[0]
+        # Ingredients are completed in recipe order, so the next one is the one after the last Combine.
+        self.action_mask = 0
+        if self._next_idx < len(self._recipe_keys):
+            self.current_ingredient = self._recipe_keys[self._next_idx]
+            self.ingredient_idx = self._next_idx
             return {
                 "ingredient": self.current_ingredient,
                 "type": self.recipe[self.current_ingredient]["type"],
@@ -196,85 +342,354 @@ class SaladEnv(Env):
         pass 
 
     def reset(self):
-        self.completed_ingredients = set()
+        self._next_idx = 0
         self.done = False
         self.current_calories = 0
         self.warnings = []  # Reset warnings to avoid accumulation
+        self._log = []
         self.state = self.set_next_ingredient()
-        self.available_ingredients = AVAILABLE_INGREDIENTS
         return self.encode_state()
     
+@njit(cache=True)
+def _batch_step_kernel(ing_idx, mask, done, calories, overshoot, allergy_hits, actions,
+                       reward_table, ing_available, ing_calories, ing_allergy_hit, calorie_limit):
+    '''
+    Args:
+        ing_idx, mask, done, calories, overshoot (np.ndarray): Per-env state, updated in place.
+        allergy_hits (np.ndarray): bool (num_envs, n) allergy violations per recipe ingredient, updated in place.
+        actions (np.ndarray): One action per env (ignored for envs that are done).
+        reward_table (np.ndarray): From _build_reward_table.
+        ing_available (np.ndarray): bool per recipe ingredient.
+        ing_calories (np.ndarray): Calories per recipe ingredient.
+        ing_allergy_hit (np.ndarray): bool per recipe ingredient, True if it contains a user allergen.
+        calorie_limit (int)
+
+    Returns:
+        (np.ndarray): int32 reward per env.
+    '''
+    rewards = np.zeros(ing_idx.shape[0], dtype=np.int32)
+    for e in range(ing_idx.shape[0]):
+        if done[e]:
+            continue
+        i = ing_idx[e]
+        # Constraint tracking, as in SaladEnv.calculate_reward (skipped on an ingredient's first action).
+        if ing_available[i] and mask[e] != 0:
+            calories[e] += ing_calories[i]
+            if calories[e] > calorie_limit:
+                overshoot[e] = calories[e] - calorie_limit
+            if ing_allergy_hit[i]:
+                allergy_hits[e, i] = True
+        ing_idx[e], mask[e], rewards[e], done[e] = _step_kernel(i, mask[e], actions[e], reward_table)
+    return rewards
+
+class BatchedSaladEnv(object):
+    ''' Steps @num_envs copies of one SaladEnv recipe at once. '''
+
+    def __init__(self, env, num_envs):
+        '''
+        Args:
+            env (SaladEnv): Supplies the recipe arrays and constraints.
+            num_envs (int)
+        '''
+        self.num_envs = num_envs
+        self.num_actions = len(env.action_map)
+        self.ingredients = tuple(env.recipe)
+        self._tables = (env.reward_table, env.ing_available, env.ing_calories,
+                        (env.ing_allergen_mask & np.uint64(env.user_allergy_mask)) != 0,
+                        env.constraints.get("calories", np.iinfo(np.int64).max))
+        self.reset()
+
+    def reset(self):
+        '''
+        Returns:
+            (np.ndarray): Encoded start state of every env.
+        '''
+        self.ing_idx = np.zeros(self.num_envs, dtype=np.int64)
+        self.mask = np.zeros(self.num_envs, dtype=np.int64)
+        self.done = np.zeros(self.num_envs, dtype=np.bool_)
+        self.calories = np.zeros(self.num_envs, dtype=np.int64)
+        self.overshoot = np.zeros(self.num_envs, dtype=np.int64)
+        self.allergy_hits = np.zeros((self.num_envs, len(self.ingredients)), dtype=np.bool_)
+        return self.encode_states()
+
+    def encode_states(self):
+        # Same encoding as SaladEnv.encode_state.
+        return self.ing_idx * (1 << self.num_actions) + self.mask
+
+    def step(self, actions):
+        '''
+        Args:
+            actions (np.ndarray): One action per env.
+
+        Returns:
+            (tuple): states, rewards, dones (np.ndarray each). Envs that are already done get reward 0.
+        '''
+        actions = np.asarray(actions, dtype=np.int64)
+        check_actions(actions, 0, self.num_actions)
+        rewards = _batch_step_kernel(self.ing_idx, self.mask, self.done, self.calories, self.overshoot, self.allergy_hits,
+                                     actions, *self._tables)
+        return self.encode_states(), rewards, self.done.copy()
+
+    def rollout(self, policy, max_steps=None):
+        '''
+        Args:
+            policy (np.ndarray): A Q-table, or the greedy action per state (Q_table.argmax(axis=1)).
+            max_steps (int): Optional cap on the episode length.
+
+        Returns:
+            (np.ndarray): Total reward per env of the greedy policy from reset().
+        '''
+        greedy = policy if policy.ndim == 1 else np.argmax(policy, axis=1)
+        states = self.reset()
+        totals = np.zeros(self.num_envs, dtype=np.int64)
+        t = 0
+        while not self.done.all() and (max_steps is None or t < max_steps):
+            states, rewards, _ = self.step(greedy[states])
+            totals += rewards
+            t += 1
+        return totals
+
+    def get_violations(self, e):
+        '''
+        Args:
+            e (int): Env index.
+
+        Returns:
+            (dict): Env @e's violations, in SaladEnv.violations' format.
+        '''
+        return {
+            "calories": int(self.overshoot[e]),
+            "allergies": [name for name, hit in zip(self.ingredients, self.allergy_hits[e]) if hit],
+            "availability": {},
+        }
+
 # Training parameters
 LEARNING_RATE = 0.1
 DISCOUNT = 0.95
 EPSILON = 0.1
 EPISODES = 2000
 
-def train_agent(env, episodes=EPISODES):
-    num_states = 2 ** len(env.action_map) * len(env.recipe.keys())
-    num_actions = len(env.action_map)
-    Q = np.zeros((num_states, num_actions))
+@njit(cache=True)
+def _seed(seed):
+    # Numba keeps its own np.random state, separate from NumPy's.
+    np.random.seed(seed)
+
+@njit(cache=True)
+def select_action(Q_row, epsilon):
+    '''
+    Args:
+        Q_row (np.ndarray): Q-values of the current state.
+        epsilon (float)
+
+    Returns:
+        (int): Epsilon-greedy action; ties go to the lowest index, like np.argmax.
+    '''
+    if np.random.random() < epsilon:
+        return np.random.randint(0, Q_row.shape[0])
+    action = 0
+    for a in range(1, Q_row.shape[0]):
+        if Q_row[a] > Q_row[action]:
+            action = a
+    return action
+
+@njit(cache=True)
+def td_update(Q, state, action, reward, next_state, learning_rate, discount):
+    '''
+    Summary:
+        The Q-learning update Q[s,a] += lr * (r + discount * max_a' Q[s',a'] - Q[s,a]), in place.
+    '''
+    best_next = Q[next_state, 0]
+    for a in range(1, Q.shape[1]):
+        best_next = max(best_next, Q[next_state, a])
+    Q[state, action] = Q[state, action] + learning_rate * (reward + discount * best_next - Q[state, action])
+
+@njit(cache=True)
+def _train_episode(Q, rewards, next_states, dones, learning_rate, discount, epsilon):
+    '''
+    Args:
+        Q (np.ndarray): (num_states, NUM_ACTIONS) Q-table, updated in place.
+        rewards (np.ndarray): (num_states, NUM_ACTIONS) reward_table, indexed by encoded state.
+        next_states, dones (np.ndarray): From _build_transition_table.
+        learning_rate, discount, epsilon (float)
+
+    Returns:
+        (float): The episode's return.
+
+    Summary:
+        One epsilon-greedy Q-learning episode from the start of the recipe.
+    '''
+    state = 0
+    done = False
+    total = 0.0
+    while not done:
+        action = select_action(Q[state], epsilon)
+        reward, next_state, done = rewards[state, action], next_states[state, action], dones[state, action]
+        td_update(Q, state, action, reward, next_state, learning_rate, discount)
+        total += reward
+        state = next_state
+    return total
+
+class ReplayBuffer(object):
+    ''' Fixed-capacity circular buffer of (state, action, reward, next_state) transitions. '''
+
+    def __init__(self, capacity):
+        '''
+        Args:
+            capacity (int): Max number of transitions kept; the oldest are overwritten first.
+        '''
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.int32)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros(capacity, dtype=np.int32)
+        self._ptr = 0
+        self._size = 0
+
+    def add(self, state, action, reward, next_state):
+        self.states[self._ptr] = state
+        self.actions[self._ptr] = action
+        self.rewards[self._ptr] = reward
+        self.next_states[self._ptr] = next_state
+        self._ptr = (self._ptr + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def sample(self, batch_size):
+        '''
+        Returns:
+            (np.ndarray): @batch_size indices drawn uniformly (with replacement) from the stored transitions.
+        '''
+        return np.random.randint(0, self._size, batch_size)
+
+    def __len__(self):
+        return self._size
+
+def _batch_td_update(Q, states, actions, td, learning_rate):
+    '''
+    Args:
+        Q (np.ndarray): Q-table, updated in place.
+        states, actions (np.ndarray): The batch's (state, action) pairs.
+        td (np.ndarray): TD error of each pair.
+        learning_rate (float)
+
+    Summary:
+        Applies a batch of TD errors at once. Repeated (state, action) pairs share one
+        update with their mean TD error, so the step size doesn't grow with the number
+        of duplicates.
+    '''
+    pairs, which, counts = np.unique(states * Q.shape[1] + actions, return_inverse=True, return_counts=True)
+    Q.flat[pairs] += learning_rate * np.bincount(which, weights=td) / counts
+
+def replay_update(Q, buffer, batch_size, learning_rate, discount):
+    '''
+    Args:
+        Q (np.ndarray): Q-table, updated in place.
+        buffer (ReplayBuffer)
+        batch_size (int)
+        learning_rate, discount (float)
+
+    Summary:
+        td_update on a sampled mini-batch at once. The TD errors all use the Q-table
+        from before the batch, and repeated (state, action) pairs are averaged (see
+        _batch_td_update), so a small buffer sampled with replacement can't overshoot.
+    '''
+    idx = buffer.sample(batch_size)
+    s, a = buffer.states[idx].astype(np.int64), buffer.actions[idx].astype(np.int64)
+    td = buffer.rewards[idx] + discount * Q[buffer.next_states[idx]].max(axis=1) - Q[s, a]
+    _batch_td_update(Q, s, a, td, learning_rate)
+
+def _train_batch(Q, rewards, next_states, dones, num_envs, learning_rate, discount, epsilon):
+    '''
+    Args:
+        Q (np.ndarray): Q-table, updated in place.
+        rewards, next_states, dones (np.ndarray): As in _train_episode.
+        num_envs (int)
+        learning_rate, discount, epsilon (float)
+
+    Returns:
+        (np.ndarray): The return of each env's episode.
+
+    Summary:
+        @num_envs epsilon-greedy Q-learning episodes run side by side: each step picks
+        all envs' actions at once and applies their updates as one batch (see _batch_td_update).
+    '''
+    states = np.zeros(num_envs, dtype=np.int64)
+    active = np.ones(num_envs, dtype=np.bool_)
+    returns = np.zeros(num_envs)
+    while active.any():
+        s = states[active]
+        explore = np.random.random(s.shape[0]) < epsilon
+        actions = np.where(explore, np.random.randint(0, Q.shape[1], s.shape[0]), Q[s].argmax(axis=1))
+        ns = next_states[s, actions]
+        td = rewards[s, actions] + discount * Q[ns].max(axis=1) - Q[s, actions]
+        _batch_td_update(Q, s, actions, td, learning_rate)
+        returns[active] += rewards[s, actions]
+        states[active] = ns
+        active[active] = ~dones[s, actions]
+    return returns
+
+def train_agent(env, episodes=EPISODES, seed=None, replay_batch_size=None, replay_capacity=10000, num_envs=None, verbose=True):
+    '''
+    Args:
+        env (SaladEnv)
+        episodes (int)
+        seed (int): Seeds the exploration (and replay sampling) for reproducible training.
+        replay_batch_size (int): If set, each step stores its transition in a ReplayBuffer and
+            updates Q on a sampled mini-batch of this size instead of on the transition alone.
+        replay_capacity (int): Size of the ReplayBuffer.
+        num_envs (int): If set, run the episodes @num_envs at a time with batched updates (see _train_batch).
+        verbose (bool): Print a progress line every 100 episodes.
+
+    Returns:
+        (np.ndarray): The float32 (num_states, num_actions) Q-table.
+    '''
+    num_ingredients, num_actions = len(env.recipe), NUM_ACTIONS
+    num_states = (1 << num_actions) * num_ingredients
+    Q = np.zeros((num_states, num_actions), dtype=np.float32)
+    if replay_batch_size and num_envs:
+        raise ValueError("train_agent: replay_batch_size and num_envs can't be combined.")
+    if seed is not None:
+        _seed(seed)
+        np.random.seed(seed)
+
+    # Encoded states are ingredient_idx * 512 + mask, so the [ingredient, mask] axes flatten into states.
+    rewards = env.reward_table.reshape(num_states, num_actions)
+    next_states, dones = _build_transition_table(num_ingredients)
+    buffer = ReplayBuffer(replay_capacity) if replay_batch_size else None
+    episodes_per_iter = num_envs or 1
+    episode_returns = np.zeros(episodes, dtype=np.float32)
     
-    for episode in range(episodes):
-        state = env.reset()
-        done = False
-        
-        while not done:
-            # Epsilon-greedy action selection
-            if random.uniform(0, 1) < EPSILON:
-                action = env.action_space.sample()
-            else:
-                action = np.argmax(Q[state, :])
-            
-            next_state, reward, done, info = env.step(action)
-            
-            # Q-learning update
-            Q[state, action] = Q[state, action] + LEARNING_RATE * (
-                reward + DISCOUNT * np.max(Q[next_state, :]) - Q[state, action]
-            )
-            
-            state = next_state
+    for episode in range(0, episodes, episodes_per_iter):
+        end = min(episode + episodes_per_iter, episodes)
+        if num_envs:
+            episode_returns[episode:end] = _train_batch(Q, rewards, next_states, dones, end - episode,
+                                                        LEARNING_RATE, DISCOUNT, EPSILON)
+        elif buffer is None:
+            episode_returns[episode] = _train_episode(Q, rewards, next_states, dones, LEARNING_RATE, DISCOUNT, EPSILON)
+        else:
+            state, done = 0, False
+            while not done:
+                action = select_action(Q[state], EPSILON)
+                buffer.add(state, action, rewards[state, action], next_states[state, action])
+                replay_update(Q, buffer, replay_batch_size, LEARNING_RATE, DISCOUNT)
+                episode_returns[episode] += rewards[state, action]
+                state, done = next_states[state, action], dones[state, action]
             
-        if episode % 100 == 0:
-            print(f"Episode {episode} completed")
+        # One progress line per 100 episodes, labelled with the last episode finished so far.
+        if verbose and episode % 100 < episodes_per_iter:
+            print(f"Episode {end - 1} completed | mean return (last 100): {episode_returns[max(0, end - 100):end].mean():.2f}")
     
     return Q
 
-
-
-# Example usage
-recipe = {
-    "tomato": {"type": "Vegetable", "prep_method": "Dice", "quantity": 2},
-    "almonds": {"type": "Nuts", "prep_method": "Grind", "quantity": 10},
-    "sesame_dressing": {"type": "Dressing", "prep_method": None, "quantity": 1},
-    "peanuts" : {"type": "Nuts", "prep_method": "Grind", "quantity": 10},
-}
-
-constraints = {
-    "calories": 300,
-    "allergies": ["peanut"]
-}
-
-env = SaladEnv(recipe, constraints)
-Q_table = train_agent(env)
-
-# Save the Q-table
-with open("trained_q_table.pkl", "wb") as f:
-    pickle.dump(Q_table, f)
-
-print("\nTraining Done! Q-table saved.\n")
-
-print("\nTraining Done!\n")
-
 # Test the trained policy
 def test_policy(env, Q_table):
     state = env.reset()
     done = False
     total_reward = 0
     episode_warnings= []
+    greedy = np.argmax(Q_table, axis=1)
     
     while not done:
-        action = np.argmax(Q_table[state, :])
+        action = int(greedy[state])
         state, reward, done, info = env.step(action)
         total_reward += reward
 
@@ -300,8 +715,30 @@ def test_policy(env, Q_table):
     print(f"\nTotal reward: {total_reward}")
 
 
-test_policy(env, Q_table)
+if __name__ == "__main__":
+    # Example usage
+    recipe = {
+        "tomato": {"type": "Vegetable", "prep_method": "Dice", "quantity": 2},
+        "almonds": {"type": "Nuts", "prep_method": "Grind", "quantity": 10},
+        "sesame_dressing": {"type": "Dressing", "prep_method": None, "quantity": 1},
+        "peanuts" : {"type": "Nuts", "prep_method": "Grind", "quantity": 10},
+    }
+
+    constraints = {
+        "calories": 300,
+        "allergies": ["peanut"]
+    }
+
+    env = SaladEnv(recipe, constraints, verbose=True)
+    Q_table = train_agent(env)
 
+    # Save the Q-table
+    with open("trained_q_table.pkl", "wb") as f:
+        pickle.dump(Q_table, f)
+    np.save("trained_q_table.npy", Q_table)
 
+    print("\nTraining Done! Q-table saved.\n")
 
+    print("\nTraining Done!\n")
 
+    test_policy(env, Q_table)
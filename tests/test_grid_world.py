@@ -0,0 +1,42 @@
+''' test_grid_world.py: Tests for the cached transitions in GridWorldMDP. '''
+
+# Python imports.
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from simple_rl.tasks.grid_world.GridWorldMDPClass import GridWorldMDP
+from simple_rl.tasks.grid_world.GridWorldStateClass import GridWorldState
+
+
+class NextLocTableTest(unittest.TestCase):
+
+    def test_moves_respect_walls_and_edges(self):
+        mdp = GridWorldMDP(width=4, height=3, goal_locs=[(4, 3)], walls=[(2, 1)])
+
+        self.assertEqual(mdp.transition_func(GridWorldState(1, 1), "right"), GridWorldState(1, 1))
+        self.assertEqual(mdp.transition_func(GridWorldState(1, 1), "left"), GridWorldState(1, 1))
+        self.assertEqual(mdp.transition_func(GridWorldState(1, 1), "up"), GridWorldState(1, 2))
+
+    def test_goal_change_after_table_is_built(self):
+        mdp = GridWorldMDP(width=5, height=3, goal_locs=[(5, 3)])
+        self.assertFalse(mdp.transition_func(GridWorldState(3, 1), "right").is_terminal())
+
+        mdp.goal_locs = [(4, 1)]
+        mdp.reset()
+
+        self.assertTrue(mdp.transition_func(GridWorldState(3, 1), "right").is_terminal())
+        self.assertFalse(mdp.transition_func(GridWorldState(4, 2), "up").is_terminal())
+
+    def test_lava_change_after_table_is_built(self):
+        mdp = GridWorldMDP(width=5, height=3, goal_locs=[(5, 3)], is_lava_terminal=True)
+        self.assertFalse(mdp.transition_func(GridWorldState(1, 1), "up").is_terminal())
+
+        mdp.lava_locs = [(1, 2)]
+
+        self.assertTrue(mdp.transition_func(GridWorldState(1, 1), "up").is_terminal())
+
+
+if __name__ == "__main__":
+    unittest.main()
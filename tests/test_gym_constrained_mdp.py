@@ -0,0 +1,242 @@
+''' test_gym_constrained_mdp.py: Tests for the SaladMakingEnv in starter_code/gym_constrained_mdp.py. '''
+
+# Python imports.
+import os
+import sys
+import unittest
+
+# Other imports.
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "starter_code"))
+import gym_constrained_mdp as gcm
+
+RECIPE = {
+    "tomato": {"type": "Vegetable", "quantity": 2, "prep_method": "Dice"},
+    "spinach": {"type": "Vegetable", "quantity": 1},
+    "sesame_dressing": {"type": "Dressing", "quantity": 10},
+    "almonds": {"type": "Nuts", "quantity": 10, "prep_method": "Grind"},
+}
+CONSTRAINTS = {"calories": 300, "allergies": ["nut"]}
+NAMES = gcm.ACTIONS + ("Bogus",)
+
+
+def reference_episode(env, actions):
+    '''
+    Args:
+        env (SaladMakingEnv): Supplies the ingredients and constraints.
+        actions (list): Action names.
+
+    Returns:
+        (list): (total reward, done, current_step, calorie_count) after each action, following
+            the per-ingredient rules SaladMakingEnv.step had before it used _step_kernel.
+    '''
+    ingredients = list(env.ingredients.values())
+    n = len(ingredients)
+    prep_steps = [0] * n
+    step, calories, total = 0, 0, env.reward
+    out = []
+    for action in actions:
+        done = False
+        if step < n:
+            ingredient = ingredients[step]
+            finished = True
+            if prep_steps[step] < len(ingredient.prep_flow) and action == ingredient.prep_flow[prep_steps[step]]:
+                total += 10
+                prep_steps[step] += 1
+                finished = prep_steps[step] >= len(ingredient.prep_flow)
+            else:
+                total -= 5
+            if finished:
+                if prep_steps[step] >= len(ingredient.prep_flow):
+                    calories += ingredient.requested_quantity * ingredient.calories
+                step += 1
+                violated = sum(r in env.constraints["allergies"] for r in ingredient.dietary_restrictions)
+                violated += calories > env.constraints["calories"]
+                total -= 2 * violated
+        elif step == n:
+            if action == "Mix":
+                total += 10
+                step += 1
+            else:
+                total -= 5
+        elif step == n + 1:
+            if action == "Serve":
+                total += 10
+                done = True
+            else:
+                total -= 5
+        if step >= n + len(env.step_order):
+            done = True
+        out.append((total, done, step, calories))
+        if done:
+            break
+    return out
+
+
+def random_actions(rng, env, length):
+    # Mostly the scripted flow with some actions swapped out, so episodes get past the prep stages.
+    actions = [action for _, action in env.get_action_schedule()]
+    actions += [str(rng.choice(NAMES)) for _ in range(length - len(actions))]
+    swaps = rng.random(len(actions)) < 0.2
+    return [str(rng.choice(NAMES)) if swap else action for action, swap in zip(actions, swaps)]
+
+
+class ActionBoundsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.env = gcm.SaladMakingEnv(RECIPE, CONSTRAINTS)
+        self.env.reset()
+
+    def test_step_by_code_rejects_out_of_range_ids(self):
+        for action_id in (-2, len(gcm.ACTIONS)):
+            with self.assertRaises(IndexError):
+                self.env.step_by_code(action_id)
+        self.assertEqual(self.env.reward, 0)
+
+    def test_unknown_action_is_penalised(self):
+        _, reward, done, _ = self.env.step_by_code(-1)
+        self.assertEqual(reward, -5)
+        self.assertFalse(done)
+
+    def test_rollout_and_vector_step_reject_out_of_range_ids(self):
+        with self.assertRaises(IndexError):
+            self.env.rollout([gcm.MEASURE, 99])
+        with self.assertRaises(IndexError):
+            self.env.pure_step(self.env.pure_reset(), len(gcm.ACTIONS))
+        with self.assertRaises(IndexError):
+            gcm.VectorSaladEnv(self.env, 2).step([gcm.MEASURE, len(gcm.ACTIONS)])
+
+
+class KernelEquivalenceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.env = gcm.SaladMakingEnv(RECIPE, CONSTRAINTS)
+        self.rng = np.random.default_rng(0)
+
+    def test_step_matches_reference_rules(self):
+        for _ in range(100):
+            self.env.reset()
+            self.env.reward = 0
+            actions = random_actions(self.rng, self.env, 25)
+            expected = reference_episode(self.env, actions)
+            for action, (total, done, step, calories) in zip(actions, expected):
+                _, reward, env_done, _ = self.env.step(action)
+                self.assertEqual((reward, env_done, self.env.current_step, self.env.calorie_count),
+                                 (total, done, step, calories))
+
+    def test_rollout_and_vector_env_match_step(self):
+        episodes = []
+        for _ in range(20):
+            self.env.reset()
+            self.env.reward = 0
+            actions = random_actions(self.rng, self.env, 25)
+            totals = [self.env.step(action)[1] for action in actions[:len(reference_episode(self.env, actions))]]
+            episodes.append((actions, np.diff(totals, prepend=0)))
+
+        for actions, step_rewards in episodes:
+            rewards, timestep = self.env.rollout(actions)
+            np.testing.assert_array_equal(rewards, step_rewards)
+            self.assertTrue(timestep.done or len(rewards) == len(actions))
+
+        codes = np.array([[gcm.ACTION_CODES.get(a, -1) for a in actions] for actions, _ in episodes], dtype=np.int32)
+        vec = gcm.VectorSaladEnv(self.env, len(episodes))
+        vec_rewards = np.zeros(codes.shape, dtype=np.int32)
+        for t in range(codes.shape[1]):
+            _, vec_rewards[:, t], _ = vec.step(codes[:, t])
+        for e, (_, step_rewards) in enumerate(episodes):
+            np.testing.assert_array_equal(vec_rewards[e, :len(step_rewards)], step_rewards)
+            self.assertFalse(vec_rewards[e, len(step_rewards):].any())
+
+
+def random_recipe(rng):
+    # Catalog ingredients (some over their available quantity) plus one that isn't stocked.
+    names = list(gcm.AVAILABLE_INGREDIENTS) + ["walnuts"]
+    recipe = {}
+    for name in rng.permutation(names)[:rng.integers(1, len(names) + 1)]:
+        details = {"type": "Nuts", "quantity": int(rng.integers(1, 6))}
+        if name in gcm.AVAILABLE_INGREDIENTS:
+            ingredient = gcm.AVAILABLE_INGREDIENTS[name].make()
+            details["type"] = gcm.STAGE_NAMES[ingredient.TYPE_CODE]
+            methods = ingredient.allowed_actions("Prepare")
+            if methods and rng.random() < 0.7:
+                details["prep_method"] = str(rng.choice(methods))
+        recipe[str(name)] = details
+    allergies = [str(a) for a in gcm.ALLERGENS + ("peanut",) if rng.random() < 0.3]
+    return recipe, {"calories": int(rng.integers(0, 600)), "allergies": allergies}
+
+
+class RolloutDeterministicTest(unittest.TestCase):
+
+    def test_matches_stepping_the_schedule(self):
+        rng = np.random.default_rng(0)
+        for _ in range(200):
+            recipe, constraints = random_recipe(rng)
+            env = gcm.SaladMakingEnv(recipe, constraints)
+            expected_reward, expected_violations = env.rollout_deterministic()
+
+            env.reset()
+            start = env.reward
+            for code in env.get_action_codes():
+                _, _, done, info = env.step_by_code(code)
+                if done:
+                    break
+
+            self.assertTrue(done)
+            self.assertEqual(env.reward - start, expected_reward, recipe)
+            self.assertEqual(info["violations"], expected_violations, recipe)
+
+
+class LogTest(unittest.TestCase):
+
+    def test_log_records_the_running_total(self):
+        env = gcm.SaladMakingEnv(RECIPE, CONSTRAINTS)
+        env.reset()
+        totals = [env.step_by_code(code)[1] for code in env.get_action_codes()]
+
+        self.assertEqual(env.get_log()[:, 2].tolist(), totals)
+        self.assertTrue(env.format_log().endswith(f"Serving: Serve, Reward: {totals[-1]}"))
+
+
+class IngredientStateTest(unittest.TestCase):
+
+    def test_prep_progress_is_tracked_by_the_env(self):
+        env = gcm.SaladMakingEnv(RECIPE, CONSTRAINTS)
+        env.reset()
+        flow = env.ingredients["tomato"].prep_flow
+        self.assertEqual(env.get_ingredient_state(0), "raw")
+
+        for action in flow:
+            env.step(action)
+
+        self.assertTrue(env.is_ready(0))
+        self.assertFalse(env.is_ready(1))
+        self.assertEqual(env.get_ingredient_state(0), flow[-1].lower())
+        self.assertFalse(hasattr(env.ingredients["tomato"], "prep_step"))
+
+
+class AllergenTest(unittest.TestCase):
+
+    def test_unknown_user_allergy_is_ignored(self):
+        env = gcm.SaladMakingEnv(RECIPE, {"calories": 300, "allergies": ["peanut"]})
+        env.reset()
+        for code in env.get_action_codes():
+            _, _, done, info = env.step_by_code(code)
+        self.assertTrue(done)
+        self.assertEqual(info["violations"]["allergies"], [])
+
+    def test_known_user_allergy_is_reported(self):
+        env = gcm.SaladMakingEnv(RECIPE, {"calories": 10000, "allergies": ["peanut", "nut"]})
+        env.reset()
+        for code in env.get_action_codes():
+            _, _, done, info = env.step_by_code(code)
+        self.assertEqual(info["violations"]["allergies"], ["nut"])
+
+    def test_strict_mask_rejects_unknown_names(self):
+        self.assertEqual(gcm.allergen_mask(["peanut"]), 0)
+        with self.assertRaises(ValueError):
+            gcm.allergen_mask(["peanut"], strict=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
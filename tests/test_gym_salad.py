@@ -0,0 +1,88 @@
+''' test_gym_salad.py: Tests for the table-driven SaladMakingEnv in starter_code/gym_salad.py. '''
+
+# Python imports.
+import os
+import sys
+import unittest
+
+# Other imports.
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "starter_code"))
+import gym_salad
+
+
+def reference_step(state, action):
+    '''
+    Returns:
+        (tuple): next state, reward, done, as SaladMakingEnv.step computed them from the
+            transition and reward dicts before it used the T/R/D tables.
+    '''
+    action_name = gym_salad.ACTIONS[action]
+    if action_name in gym_salad.TRANSITIONS.get(state, {}):
+        next_state = gym_salad.TRANSITIONS[state][action_name]
+    else:
+        next_state = state
+        action_name = "Invalid"
+    return next_state, gym_salad.REWARDS.get(action_name, -10), state == gym_salad.COMPLETE
+
+
+class ActionBoundsTest(unittest.TestCase):
+
+    def test_step_rejects_out_of_range_actions(self):
+        env = gym_salad.SaladMakingEnv()
+        env.reset()
+        for action in (-1, len(gym_salad.ACTIONS), 8):
+            with self.assertRaises(IndexError):
+                env.step(action)
+        self.assertEqual(env.state, 0)
+
+    def test_invalid_label_is_still_a_legal_index(self):
+        # "Invalid" has an index, so it was always accepted and just penalised.
+        env = gym_salad.SaladMakingEnv()
+        env.reset()
+        self.assertEqual(env.step(gym_salad.ACTIONS.index("Invalid")), (0, gym_salad.INVALID_REWARD, False, {}))
+
+    def test_transition_and_step_batch_reject_out_of_range_actions(self):
+        with self.assertRaises(IndexError):
+            gym_salad.transition(0, 7)
+        with self.assertRaises(IndexError):
+            gym_salad.step_batch(np.zeros(2, dtype=np.int32), np.array([0, 9]))
+
+
+class KernelEquivalenceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+
+    def test_step_matches_reference_rules(self):
+        env = gym_salad.SaladMakingEnv()
+        for _ in range(200):
+            env.reset()
+            state = 0
+            for _ in range(30):
+                # Favour the scripted action for the current state so episodes reach Serving.
+                action = min(state, gym_salad.NUM_ACTIONS - 1) if self.rng.random() < 0.6 else int(self.rng.integers(len(gym_salad.ACTIONS)))
+                state, reward, done = reference_step(state, action)
+                self.assertEqual(env.step(action), (state, reward, done, {}))
+
+    def test_every_state_action_pair(self):
+        for state in range(len(gym_salad.STATES)):
+            for action in range(len(gym_salad.ACTIONS)):
+                self.assertEqual(gym_salad.transition(state, action), reference_step(state, action))
+
+    def test_rollout_matches_step_batch(self):
+        states = self.rng.integers(0, len(gym_salad.STATES), size=16).astype(np.int32)
+        rng = np.random.default_rng(1)
+        final, rewards, dones, _ = gym_salad.rollout(rng, 16, 40, states)
+
+        actions = np.random.default_rng(1).integers(0, gym_salad.NUM_ACTIONS, size=(16, 40), dtype=np.int32)
+        for t in range(40):
+            states, step_rewards, step_dones = gym_salad.step_batch(states, actions[:, t])
+            np.testing.assert_array_equal(rewards[:, t], step_rewards)
+            np.testing.assert_array_equal(dones[:, t], step_dones)
+        np.testing.assert_array_equal(final, states)
+
+
+if __name__ == "__main__":
+    unittest.main()
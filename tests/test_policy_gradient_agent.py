@@ -0,0 +1,77 @@
+''' test_policy_gradient_agent.py: Tests for PolicyGradientAgent and sample_action. '''
+
+# Python imports.
+import os
+import sys
+import unittest
+
+# Other imports.
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from simple_rl.agents.PolicyGradientAgentClass import PolicyGradientAgent, sample_action
+from simple_rl.mdp.StateClass import State
+
+
+class PolicyGradientStepTest(unittest.TestCase):
+
+    def test_one_step_on_a_known_transition(self):
+        agent = PolicyGradientAgent(["left", "right"], 2, alpha=0.1, gamma=0.9)
+
+        # Uniform policy, G = 1: w += alpha * phi (onehot(a) - pi) G.
+        agent.update(State([1.0, 0.0]), "left", 1.0, State([0.0, 1.0], is_terminal=True))
+
+        np.testing.assert_allclose(agent.weights, [[0.05, -0.05], [0.0, 0.0]])
+        self.assertEqual(len(agent.buffer), 0)
+
+    def test_negative_return_pushes_the_action_down(self):
+        agent = PolicyGradientAgent(["left", "right"], 2, alpha=0.1, gamma=0.9)
+        agent.update(State([0.0, 1.0]), "left", 0.0, State([0.0, 1.0]))
+        agent.update(State([0.0, 1.0]), "right", -2.0, State([1.0, 0.0], is_terminal=True))
+
+        # Both steps share the features [0, 1]; returns are 0.9 * -2 and -2.
+        expected = 0.1 * (0.5 * -1.8 - 0.5 * -2.0)
+        np.testing.assert_allclose(agent.weights, [[0.0, 0.0], [expected, -expected]], rtol=1e-6)
+        self.assertGreater(agent.weights[1, 0], agent.weights[1, 1])
+
+
+class SampleActionTest(unittest.TestCase):
+
+    def setUp(self):
+        # Logits 0, log 2, log 3 give the softmax 1/6, 2/6, 3/6.
+        self.weights = np.log([[1.0, 2.0, 3.0]])
+        self.features = np.ones(1)
+
+    def _draw(self, seed, n):
+        rng = np.random.default_rng(seed)
+        actions = np.zeros(n, dtype=np.int64)
+        for i in range(n):
+            actions[i], rng = sample_action(self.weights, self.features, rng)
+        return actions
+
+    def test_seeded_draws_repeat(self):
+        np.testing.assert_array_equal(self._draw(3, 200), self._draw(3, 200))
+        self.assertFalse(np.array_equal(self._draw(3, 200), self._draw(4, 200)))
+
+    def test_frequencies_follow_the_softmax(self):
+        counts = np.bincount(self._draw(0, 30000), minlength=3) / 30000.0
+        np.testing.assert_allclose(counts, [1 / 6.0, 2 / 6.0, 3 / 6.0], atol=0.01)
+
+
+class ResetTest(unittest.TestCase):
+
+    def test_reset_clears_buffer_weights_and_rng(self):
+        agent = PolicyGradientAgent(["left", "right"], 2, seed=7)
+        first = [agent.act(State([1.0, 0.0]), 0.0) for _ in range(20)]
+        agent.weights[:] = 1.0
+        self.assertGreater(len(agent.buffer), 0)
+
+        agent.reset()
+
+        self.assertEqual(len(agent.buffer), 0)
+        self.assertFalse(agent.weights.any())
+        self.assertEqual([agent.act(State([1.0, 0.0]), 0.0) for _ in range(20)], first)
+
+
+if __name__ == "__main__":
+    unittest.main()
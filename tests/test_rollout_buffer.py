@@ -0,0 +1,60 @@
+''' test_rollout_buffer.py: Tests for RolloutBuffer in simple_rl/utils/additional_datastructures.py. '''
+
+# Python imports.
+import os
+import sys
+import unittest
+
+# Other imports.
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from simple_rl.utils.additional_datastructures import RolloutBuffer
+
+
+def _fill(rewards, dones):
+    buffer = RolloutBuffer(len(rewards), 1)
+    for r, d in zip(rewards, dones):
+        buffer.add([0.0], 0, r, d)
+    return buffer
+
+
+class ComputeReturnsTest(unittest.TestCase):
+
+    def test_hand_computed_with_episode_boundary(self):
+        buffer = _fill([1.0, 2.0, 3.0, 4.0, 5.0], [False, False, True, False, False])
+
+        returns = buffer.compute_returns(0.99)
+
+        expected = [1.0 + 0.99 * 2.0 + 0.99 ** 2 * 3.0, 2.0 + 0.99 * 3.0, 3.0, 4.0 + 0.99 * 5.0, 5.0]
+        self.assertEqual(returns.dtype, np.float32)
+        np.testing.assert_allclose(returns, expected, rtol=1e-6)
+
+    def test_zero_discount_returns_rewards(self):
+        buffer = _fill([1.0, -2.0, 3.0], [False, False, True])
+
+        returns = buffer.compute_returns(0.0)
+
+        self.assertTrue(np.all(np.isfinite(returns)))
+        np.testing.assert_array_equal(returns, [1.0, -2.0, 3.0])
+
+    def test_long_segment_stays_finite(self):
+        buffer = _fill(np.ones(8000), np.zeros(8000, dtype=bool))
+
+        returns = buffer.compute_returns(0.9)
+
+        self.assertTrue(np.all(np.isfinite(returns)))
+        self.assertAlmostEqual(float(returns[0]), 10.0, places=4)
+        self.assertAlmostEqual(float(returns[-1]), 1.0)
+
+    def test_wrapped_buffer_starts_at_oldest(self):
+        buffer = _fill([1.0, 1.0, 1.0], [False, False, False])
+        buffer.add([0.0], 0, 10.0, True)
+
+        returns = buffer.compute_returns(0.5)
+
+        np.testing.assert_allclose(returns, [1.0 + 0.5 * 6.0, 1.0 + 0.5 * 10.0, 10.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
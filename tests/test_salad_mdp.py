@@ -0,0 +1,112 @@
+''' test_salad_mdp.py: Tests for the tabular SaladMakingMDP in robot-cooking/salad_mdp.py. '''
+
+# Python imports.
+import copy
+import os
+import sys
+import unittest
+
+# Other imports.
+import numpy as np
+
+root_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, root_dir)
+sys.path.insert(0, os.path.join(root_dir, "examples"))
+sys.path.insert(0, os.path.join(root_dir, "robot-cooking"))
+import salad_mdp
+
+INGREDIENTS = {"lettuce": "raw", "avocado": "measured", "cucumber": "unwashed"}
+TOOLS = ["knife", "bowl"]
+
+
+class TablesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.mdp = salad_mdp.SaladMakingMDP()
+
+    def test_tables_match_transition_and_reward_logic(self):
+        states = self.mdp.get_states()
+        self.assertEqual(self.mdp.T.shape, (len(states), len(self.mdp.actions)))
+        for sid, state in enumerate(states):
+            self.assertEqual(self.mdp.get_state_id(state), sid)
+            for aid, action in enumerate(self.mdp.actions):
+                next_state = self.mdp._compute_transition(state, action)
+                table_next = states[self.mdp.T[sid, aid]]
+                self.assertEqual(table_next, next_state)
+                self.assertEqual(table_next.is_terminal(), next_state.is_terminal())
+                self.assertEqual(self.mdp.transition_func(state, action), next_state)
+                self.assertEqual(self.mdp.R[sid, aid], self.mdp._reward_logic(state, action, next_state) or 0)
+
+    def test_serve_path_ends_in_terminal_state(self):
+        agent = salad_mdp.SaladAgent("scripted", self.mdp.actions)
+        state = self.mdp.init_state
+        for _ in range(len(salad_mdp.STAGE_CODES)):
+            if state.is_terminal():
+                break
+            action = agent.act(state, 0)
+            sid = self.mdp.get_state_id(state)
+            state = self.mdp.get_states()[self.mdp.T[sid, self.mdp.actions.index(action)]]
+        self.assertTrue(state.is_terminal())
+        self.assertEqual(state.data["stage"], "done")
+        self.assertTrue(self.mdp._terminal[self.mdp.get_state_id(state)])
+
+    def test_unreachable_state_has_no_id(self):
+        state = salad_mdp.SaladState({"lettuce": "missing"}, "clarify", TOOLS)
+        self.assertIsNone(self.mdp.get_state_id(state))
+        self.assertEqual(self.mdp.transition_func(state, "serve").data["stage"], "done")
+
+    def test_tabular_vi_matches_bellman_backup(self):
+        rng = np.random.default_rng(0)
+        self.mdp.R = rng.random(self.mdp.R.shape).astype(np.float32)
+        V = self.mdp.run_tabular_vi(delta=1e-6, max_iterations=1000)
+
+        states = self.mdp.get_states()
+        for sid, state in enumerate(states):
+            if state.is_terminal():
+                self.assertEqual(V[sid], 0.0)
+                continue
+            backup = max(self.mdp.R[sid, aid] + self.mdp.gamma * V[self.mdp.get_state_id(self.mdp._compute_transition(state, action))]
+                         for aid, action in enumerate(self.mdp.actions))
+            self.assertAlmostEqual(V[sid], backup, places=4)
+
+
+class SaladStateTest(unittest.TestCase):
+
+    def test_equal_states_hash_equal(self):
+        state = salad_mdp.SaladState(INGREDIENTS, "mixing", TOOLS)
+        reordered = salad_mdp.SaladState(dict(reversed(list(INGREDIENTS.items()))), "mixing", ["bowl"])
+        self.assertEqual(state, reordered)
+        self.assertEqual(hash(state), hash(reordered))
+        self.assertNotEqual(state, salad_mdp.SaladState(INGREDIENTS, "dressing", TOOLS))
+        self.assertEqual(len({state, reordered}), 1)
+
+    def test_features_are_int8_codes(self):
+        state = salad_mdp.SaladState(INGREDIENTS, "mixing", TOOLS)
+        features = state.features()
+        self.assertEqual(features.dtype, np.int8)
+        expected = [salad_mdp.STATUS_CODES[s] for s in INGREDIENTS.values()] + [salad_mdp.STAGE_CODES["mixing"]]
+        np.testing.assert_array_equal(features, expected)
+
+        onehot = state.features_onehot()
+        self.assertEqual(onehot.dtype, np.float32)
+        np.testing.assert_array_equal(onehot.argmax(axis=1), features)
+        np.testing.assert_array_equal(onehot.sum(axis=1), 1.0)
+
+    def test_deepcopy_copies_tools_only(self):
+        state = salad_mdp.SaladState(INGREDIENTS, "serving", TOOLS, is_terminal=True)
+        clone = copy.deepcopy(state)
+        self.assertEqual(clone, state)
+        self.assertTrue(clone.is_terminal())
+        self.assertIs(clone.data["ingredients"], state.data["ingredients"])
+        self.assertIsNot(clone.data["tools"], state.data["tools"])
+        self.assertEqual(clone.data["tools"], TOOLS)
+        np.testing.assert_array_equal(clone.features(), state.features())
+
+    def test_ingredients_are_read_only(self):
+        state = salad_mdp.SaladState(INGREDIENTS, "initial", TOOLS)
+        with self.assertRaises(TypeError):
+            state.data["ingredients"]["lettuce"] = "cut"
+
+
+if __name__ == "__main__":
+    unittest.main()
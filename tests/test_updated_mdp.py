@@ -0,0 +1,209 @@
+''' test_updated_mdp.py: Tests for the Q-learning SaladEnv in starter_code/updated_mdp.py. '''
+
+# Python imports.
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+# Other imports.
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "starter_code"))
+import updated_mdp
+
+
+class ReplayUpdateTest(unittest.TestCase):
+
+    def test_duplicate_samples_are_averaged(self):
+        # A one-transition buffer always samples the same (state, action) batch_size times.
+        Q = np.zeros((4, updated_mdp.NUM_ACTIONS))
+        buffer = updated_mdp.ReplayBuffer(8)
+        buffer.add(0, 0, 100.0, 1)
+
+        updated_mdp.replay_update(Q, buffer, 32, 0.1, 0.95)
+
+        expected = np.zeros_like(Q)
+        updated_mdp.td_update(expected, 0, 0, 100.0, 1, 0.1, 0.95)
+        self.assertAlmostEqual(Q[0, 0], 10.0)
+        np.testing.assert_allclose(Q, expected)
+
+    def test_distinct_pairs_each_get_one_update(self):
+        Q = np.zeros((4, updated_mdp.NUM_ACTIONS))
+        buffer = updated_mdp.ReplayBuffer(8)
+        buffer.add(0, 1, 10.0, 2)
+        buffer.add(1, 2, -20.0, 3)
+
+        np.random.seed(0)
+        updated_mdp.replay_update(Q, buffer, 64, 0.5, 0.9)
+
+        self.assertAlmostEqual(Q[0, 1], 5.0)
+        self.assertAlmostEqual(Q[1, 2], -10.0)
+        self.assertEqual(np.count_nonzero(Q), 2)
+
+
+RECIPE = {
+    "tomato": {"type": "Vegetable", "prep_method": "Dice", "quantity": 2},
+    "almonds": {"type": "Nuts", "prep_method": "Grind", "quantity": 10},
+    "sesame_dressing": {"type": "Dressing", "prep_method": None, "quantity": 1},
+}
+CONSTRAINTS = {"calories": 300, "allergies": ["nut"]}
+OTHER_RECIPE = {
+    "carrot": {"type": "Vegetable", "prep_method": "Shred", "quantity": 2},
+    "cheese": {"type": "Dairy", "prep_method": None, "quantity": 10},
+    "peanuts": {"type": "Nuts", "prep_method": "Crush", "quantity": 10},
+    "croutons": {"type": "Grain", "prep_method": None, "quantity": 5},
+}
+OTHER_CONSTRAINTS = {"calories": 150, "allergies": ["peanut", "dairy"]}
+
+
+def reference_reward(previous_actions, ingredient_type, prep_method, action_name):
+    '''
+    Returns:
+        (int): The reward SaladEnv.calculate_reward gave for @action_name before the reward
+            table existed (constraint tracking aside, which never changed the reward).
+    '''
+    if not previous_actions:
+        return 100 if action_name == "Measure" else -100
+    reward = 0
+    if action_name == "Wash":
+        if ingredient_type == "Vegetable":
+            reward += 50 if "Wash" not in previous_actions else -25
+        else:
+            reward -= 100
+    if action_name == "Roast":
+        if ingredient_type == "Nuts":
+            if any(act in previous_actions for act in {"Grind", "Crush", "Dice"}):
+                reward += 75
+            elif "Roast" not in previous_actions:
+                reward += 125
+            else:
+                reward -= 10
+        else:
+            reward -= 100
+    if ingredient_type == "Dressing" and action_name not in {"Measure", "Combine"}:
+        reward -= 100
+    if action_name in {"Chop", "Dice", "Shred", "Crush", "Grind"}:
+        reward += 75 if action_name == prep_method else -50
+    if action_name in previous_actions:
+        reward -= 50
+    required = {"Measure"} | {"Vegetable": {"Wash"}, "Nuts": {"Roast"}}.get(ingredient_type, set())
+    if action_name == "Combine" and set(previous_actions) >= required:
+        reward += 100
+    return reward
+
+
+class RewardTableTest(unittest.TestCase):
+
+    def test_table_matches_reference_rules(self):
+        for recipe, constraints in ((RECIPE, CONSTRAINTS), (OTHER_RECIPE, OTHER_CONSTRAINTS)):
+            env = updated_mdp.SaladEnv(recipe, constraints)
+            for i, details in enumerate(recipe.values()):
+                for mask in range(1 << updated_mdp.NUM_ACTIONS):
+                    # action_bit puts the first action in the most significant bit.
+                    previous = [name for a, name in enumerate(updated_mdp.ACTIONS)
+                                if mask & (1 << (updated_mdp.NUM_ACTIONS - 1 - a))]
+                    for a, name in enumerate(updated_mdp.ACTIONS):
+                        expected = reference_reward(previous, details["type"], details["prep_method"], name)
+                        self.assertEqual(env.reward_table[i, mask, a], expected, (i, previous, name))
+
+
+class KernelEquivalenceTest(unittest.TestCase):
+
+    def test_step_kernel_matches_env_step(self):
+        rng = np.random.default_rng(0)
+        for recipe, constraints in ((RECIPE, CONSTRAINTS), (OTHER_RECIPE, OTHER_CONSTRAINTS)):
+            env = updated_mdp.SaladEnv(recipe, constraints)
+            for _ in range(50):
+                env.reset()
+                ing_idx, mask, done = 0, 0, False
+                while not done:
+                    action = int(rng.integers(updated_mdp.NUM_ACTIONS))
+                    state, reward, env_done, _ = env.step(action)
+                    ing_idx, mask, kernel_reward, done = updated_mdp._step_kernel(ing_idx, mask, action, env.reward_table)
+                    self.assertEqual((ing_idx * (1 << updated_mdp.NUM_ACTIONS) + mask, kernel_reward, done),
+                                     (state, reward, env_done))
+
+    def test_batched_env_matches_env(self):
+        rng = np.random.default_rng(1)
+        num_envs, num_steps = 8, 60
+        for recipe, constraints in ((RECIPE, CONSTRAINTS), (OTHER_RECIPE, OTHER_CONSTRAINTS)):
+            actions = rng.integers(updated_mdp.NUM_ACTIONS, size=(num_envs, num_steps))
+            batch = updated_mdp.BatchedSaladEnv(updated_mdp.SaladEnv(recipe, constraints), num_envs)
+            results = [batch.step(actions[:, t]) for t in range(num_steps)]
+
+            for e in range(num_envs):
+                env = updated_mdp.SaladEnv(recipe, constraints)
+                done = False
+                for t in range(num_steps):
+                    states, rewards, dones = results[t]
+                    if done:
+                        self.assertEqual(rewards[e], 0)
+                        continue
+                    state, reward, done, _ = env.step(int(actions[e, t]))
+                    self.assertEqual((states[e], rewards[e], dones[e]), (state, reward, done))
+                self.assertEqual(batch.get_violations(e), env.violations)
+
+
+class TrainAgentTest(unittest.TestCase):
+
+    def test_verbose_false_prints_nothing(self):
+        env = updated_mdp.SaladEnv(RECIPE, CONSTRAINTS)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            Q = updated_mdp.train_agent(env, episodes=200, seed=0, verbose=False)
+        self.assertEqual(out.getvalue(), "")
+
+        with contextlib.redirect_stdout(out):
+            Q_verbose = updated_mdp.train_agent(env, episodes=200, seed=0)
+        self.assertEqual([line.split(" |")[0] for line in out.getvalue().splitlines()],
+                         ["Episode 0 completed", "Episode 100 completed"])
+        np.testing.assert_array_equal(Q, Q_verbose)
+
+    def test_batched_progress_names_the_last_episode(self):
+        env = updated_mdp.SaladEnv(RECIPE, CONSTRAINTS)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            updated_mdp.train_agent(env, episodes=300, seed=0, num_envs=100)
+        self.assertEqual([line.split(" |")[0] for line in out.getvalue().splitlines()],
+                         ["Episode 99 completed", "Episode 199 completed", "Episode 299 completed"])
+
+    def test_batched_training_learns_the_same_greedy_policy(self):
+        # Ingredients with no prep step, so the best policy (Measure, Combine each) is clear-cut.
+        recipe = {
+            "cheese": {"type": "Dairy", "prep_method": None, "quantity": 10},
+            "croutons": {"type": "Grain", "prep_method": None, "quantity": 5},
+            "sesame_dressing": {"type": "Dressing", "prep_method": None, "quantity": 1},
+        }
+        env = updated_mdp.SaladEnv(recipe, {"calories": 100, "allergies": ["dairy"]})
+
+        def greedy_actions(Q):
+            batch = updated_mdp.BatchedSaladEnv(env, 1)
+            states, actions = batch.reset(), []
+            while not batch.done.all():
+                action = Q[states].argmax(axis=1)
+                actions.append(int(action[0]))
+                states, _, _ = batch.step(action)
+            return actions
+
+        single = updated_mdp.train_agent(env, episodes=1000, seed=0, verbose=False)
+        batched = updated_mdp.train_agent(env, episodes=1000, seed=0, num_envs=16, verbose=False)
+
+        measure_combine = [updated_mdp.MEASURE, updated_mdp.COMBINE]
+        self.assertEqual(greedy_actions(single), measure_combine * len(recipe))
+        self.assertEqual(greedy_actions(batched), greedy_actions(single))
+
+
+class BatchedSaladEnvTest(unittest.TestCase):
+
+    def test_step_rejects_out_of_range_actions(self):
+        batch = updated_mdp.BatchedSaladEnv(updated_mdp.SaladEnv(RECIPE, CONSTRAINTS), 2)
+        for bad in (-1, updated_mdp.NUM_ACTIONS):
+            with self.assertRaises(IndexError):
+                batch.step([0, bad])
+        self.assertFalse(batch.mask.any())
+
+
+if __name__ == "__main__":
+    unittest.main()